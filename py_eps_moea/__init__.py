@@ -1,2 +1,46 @@
-__all__ = ['creature', 'eps_moea', 'test_functions']
+# The package's modules are only imported when first used, so that importing
+# the package is cheap (it does not even import numpy), and a process only
+# pays for the parts it uses: e.g. a worker evaluating objectives, or a run
+# that needs eps_moea_optimize() but not the asyncio, multiprocessing or test
+# machinery.
 
+import sys
+
+# Module of each name available from the package:
+_exports = dict(
+    eps_moea_optimize='eps_moea', iter_eps_moea='eps_moea',
+    EpsMOEA='eps_moea', pareto_front='eps_moea',
+    Creature='creature', EpsArchive='archive',
+    Checkpointer='checkpoint', EvaluationCache='cache', RunStats='stats',
+    KNNSurrogate='surrogate', HistoryRecorder='history',
+    read_history='history', RandomStream='streams',
+    hypervolume='indicators', ConvergenceMonitor='indicators',
+    island_optimize='islands', eps_moea_optimize_async='aio')
+
+_modules = ('aio', 'archive', 'benchmark', 'cache', 'checkpoint', 'creature',
+    'dominance', 'eps_moea', 'history', 'indicators', 'islands', 'stats',
+    'streams', 'surrogate', 'test_functions')
+
+__all__ = ['eps_moea_optimize', 'iter_eps_moea', 'EpsMOEA', 'Creature',
+    'EpsArchive']
+
+def _import(module):
+    # Not importlib.import_module(), importing importlib costs more than the
+    # rest of the package.
+    module = __name__ + '.' + module
+    __import__(module)
+    return sys.modules[module]
+
+def __getattr__(name):
+    if name in _exports:
+        value = getattr(_import(_exports[name]), name)
+    elif name in _modules:
+        value = _import(name)
+    else:
+        raise AttributeError("module %r has no attribute %r" % \
+            (__name__, name))
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports) | set(_modules))
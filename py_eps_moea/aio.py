@@ -0,0 +1,105 @@
+# An asyncio driver for epsilon-moea, for objectives that spend their time
+# waiting on I/O, e.g. requests to a simulation server. Requires Python 3.5
+# or later.
+#
+# Evaluations are coroutines, of which a semaphore keeps a number in flight.
+# Each one passes its offspring through the acceptance tests as soon as it
+# completes, and the breeding loop makes a new batch whenever a slot is free.
+# All of this runs on the event loop's thread, so accepting a batch is never
+# interleaved with another.
+
+import asyncio
+import numpy as N
+
+from .eps_moea import EpsMOEA, _breed, _integrate
+from .streams import RandomStream
+
+async def _evaluate_batch(run, offsprings, objectives, timeout, slots):
+    """Evaluate one batch and accept it into the run, then free its slot.
+    A batch that times out is dropped, its iterations counted as stagnant.
+    """
+    try:
+        fitness = await asyncio.wait_for(objectives(offsprings), timeout)
+    except asyncio.TimeoutError:
+        run.archive_stagnation += len(offsprings) // 2
+    else:
+        run.archive_stagnation = _integrate(run.population, run.fitness,
+            run.archive, offsprings, fitness, run.grid, run.archive_stagnation,
+            None, None, run._dominance, rng=run.rng)
+    finally:
+        slots.release()
+    run._batch_done()
+
+async def _evaluate_population(population, objectives, in_flight):
+    slots = asyncio.Semaphore(in_flight)
+    async def evaluate(chunk):
+        async with slots:
+            return await objectives(chunk)
+
+    chunks = N.array_split(population, min(in_flight, len(population)))
+    return N.vstack(await asyncio.gather(*[evaluate(chunk) \
+        for chunk in chunks]))
+
+async def eps_moea_optimize_async(creature, pop_size, conv_gens, num_gens,
+    objectives, grid, batch_size=1, in_flight=8, timeout=None, monitor=None,
+    rng=None):
+    """Run an optimization using the epsilon-moea algorithm, like
+    eps_moea_optimize(), with objectives that are coroutine functions.
+
+    Arguments:
+    creature, pop_size, conv_gens, num_gens, grid, batch_size, monitor, rng -
+        as for eps_moea_optimize().
+    objectives - an async function that given a population array returns
+        the fitness array.
+    in_flight - the maximal number of concurrent calls to objectives. The
+        initial population is evaluated in this many chunks.
+    timeout - seconds to wait for the evaluation of a batch of offspring
+        before cancelling it and dropping the batch. None waits forever. The
+        initial population is not timed.
+
+    When the run converges or the monitor stops it, evaluations still in
+    flight are cancelled. If the run itself is cancelled, so are they.
+
+    Returns:
+    population, fitness, archive - as for eps_moea_optimize().
+    """
+    rng = RandomStream(rng)
+    population = creature.gen_population(pop_size, rng)
+    fitness = await _evaluate_population(population, objectives, in_flight)
+    run = EpsMOEA(creature, pop_size, conv_gens, num_gens, None, grid,
+        batch_size, monitor=monitor, rng=rng, initial=(population, fitness))
+    run.evaluations = pop_size
+
+    slots = asyncio.Semaphore(in_flight)
+    tasks = set()
+    try:
+        while True:
+            await slots.acquire()
+            for task in [task for task in tasks if task.done()]:
+                tasks.discard(task)
+                task.result() # raise errors of objectives.
+
+            if run.gens_left <= 0:
+                break
+            if run.stopped or run.archive_stagnation >= conv_gens:
+                for task in tasks:
+                    task.cancel()
+                break
+
+            num_pairs = min(batch_size, run.gens_left)
+            offsprings = _breed(creature, run.population, run.fitness,
+                run.archive, num_pairs, rng=run.rng)
+            run.gens_left -= num_pairs
+            run.evaluations += len(offsprings)
+            tasks.add(asyncio.ensure_future(_evaluate_batch(run, offsprings,
+                objectives, timeout, slots)))
+
+        slots.release()
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                raise result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    return run.population, run.fitness, run.archive
@@ -0,0 +1,213 @@
+# This class holds the epsilon-dominance archive of a run.
+#
+# An epsilon-box is identified by integer coordinates, the fitness divided by
+# the grid and rounded down, so boxes compare exactly, and fitness below zero
+# is boxed like fitness above it.
+#
+# The archive keeps its own copy of its members' genes, fitness and
+# epsilon-box, independent of the population, so members stay in it after
+# they are replaced in the population. The arrays are allocated with room to
+# spare and doubled when full, and a member is removed by moving the last one
+# into its place. The epsilon-boxes are stored objective by objective, so
+# that an acceptance test classifies every member's box against the
+# contender's in one vectorized pass over contiguous rows, which matters
+# with many objectives, where nearly every member has a box of its own.
+
+import numpy as N
+
+def grid_boxes(fitness, grid):
+    """The epsilon-boxes of fitness vectors.
+
+    Arguments:
+    fitness - an n by t array of fitness vectors, or one vector.
+    grid - the size of the hypercubes in the epsilon-dominance tests.
+
+    Returns:
+    an int64 array of the same shape, the coordinates of each vector's box,
+    whose lower corner is at the coordinates times grid.
+    """
+    return N.floor_divide(fitness, grid).astype(N.int64)
+
+def compare_boxes(boxes, box):
+    """Compare epsilon-boxes to one box. A member's box dominates the given
+    box if it is better in some objective and worse in none, is dominated by
+    it if it is worse in some and better in none, is the same box if neither,
+    and is incomparable if both.
+
+    Arguments:
+    boxes - a t by n array, the coordinates of n boxes, objective by
+        objective.
+    box - a length t vector, the coordinates of the box compared to.
+
+    Returns:
+    better, worse - length n boolean vectors, True where a box is better
+        (worse) than the given box in some objective.
+    """
+    box = N.asarray(box)[:,None]
+    return (boxes < box).any(axis=0), (boxes > box).any(axis=0)
+
+class EpsArchive(object):
+    def __init__(self, genes, fitness, boxes, capacity=64, grid=None, 
+        violation=0.):
+        """
+        Arguments:
+        genes - an n by c array, the chromosomes of the initial members,
+            e.g. the pareto front of the initial population.
+        fitness - the n by t fitness of the initial members.
+        boxes - the n by t epsilon-boxes of the initial members, as given by
+            grid_boxes().
+        capacity - number of members to make room for initially. The archive
+            grows beyond it as needed.
+        grid - the size of the hypercubes the boxes were computed with. If
+            None, boxes are instead given as the lower corners of the boxes
+            (the epsilon-fitness, as archive_accept() gets them).
+        violation - the total constraint violation of the initial members.
+
+        For constrained problems, the archive holds feasible members. Until
+        one is offered, it holds instead the least violating individual
+        offered so far, and its violation attribute is that individual's.
+
+        The journal attribute may be set to a list, to which a tuple
+        (inserted, genes, fitness) is then appended whenever a member is added
+        (inserted is True) or removed.
+        """
+        capacity = max(capacity, len(genes), 1)
+        self._size = 0
+        self._genes = N.empty((capacity, genes.shape[1]), dtype=genes.dtype)
+        self._fit = N.empty((capacity, fitness.shape[1]))
+        self._boxes = N.empty((fitness.shape[1], capacity), dtype=boxes.dtype)
+        self._grid = grid
+        self.violation = violation
+        self.journal = None
+
+        for member in range(len(genes)):
+            self._append(genes[member], fitness[member], boxes[member])
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def genes(self):
+        """The members' chromosomes (a view, valid until the archive changes).
+        """
+        return self._genes[:self._size]
+
+    @property
+    def fitness(self):
+        """The members' fitness (a view, valid until the archive changes)."""
+        return self._fit[:self._size]
+
+    @property
+    def boxes(self):
+        """The members' epsilon-boxes (a view, valid until the archive
+        changes).
+        """
+        return self._boxes[:,:self._size].T
+
+    def _corners(self, boxes):
+        """Lower corners of boxes, for the tie-break within a box."""
+        return boxes if self._grid is None else boxes*self._grid
+
+    def _append(self, genes, fit, box):
+        pos = self._size
+        if pos == len(self._genes):
+            for name in ('_genes', '_fit'):
+                old = getattr(self, name)
+                new = N.empty((2*len(old),) + old.shape[1:], dtype=old.dtype)
+                new[:pos] = old
+                setattr(self, name, new)
+            new = N.empty((len(self._boxes), 2*pos), dtype=self._boxes.dtype)
+            new[:,:pos] = self._boxes
+            self._boxes = new
+
+        self._genes[pos] = genes
+        self._fit[pos] = fit
+        self._boxes[:,pos] = box
+        if self.journal is not None:
+            self.journal.append((True, self._genes[pos].copy(), fit.copy()))
+        self._size += 1
+
+    def _remove(self, pos):
+        """Remove a member by moving the last member into its place."""
+        if self.journal is not None:
+            self.journal.append((False, self._genes[pos].copy(), 
+                self._fit[pos].copy()))
+
+        last = self._size - 1
+        if pos != last:
+            self._genes[pos] = self._genes[last]
+            self._fit[pos] = self._fit[last]
+            self._boxes[:,pos] = self._boxes[:,last]
+
+        self._size = last
+
+    def accept(self, genes, contend_fit, box, violation=0.):
+        """Update the archive with a contender using epsilon-dominance. Members
+        whose box is dominated by the contender's are removed, and an accepted
+        contender is added. A contender with a smaller constraint violation
+        than the members replaces them all, and any other infeasible contender
+        is rejected.
+
+        Arguments:
+        genes - the chromosome of the contender.
+        contend_fit - the fitness of the contender.
+        box - a vector of length t with the epsilon-box of the contender, in
+            the same form as the boxes given on construction.
+        violation - the total constraint violation of the contender.
+
+        Returns:
+        accepted - a boolean value stating whether the contender was accepted.
+        """
+        if violation > 0 or self.violation > 0:
+            if self._size and self.violation <= violation:
+                return False
+            for pos in range(self._size - 1, -1, -1):
+                self._remove(pos)
+            self.violation = violation
+            self._append(genes, contend_fit, box)
+            return True
+
+        better, worse = compare_boxes(self._boxes[:,:self._size], box)
+        if (better & ~worse).any():
+            return False # a member's box dominates the contender's.
+
+        in_grid = N.nonzero(~(better | worse))[0]
+        if len(in_grid):
+            # This hypercube may have non-dominated members.
+            lower_fit = (self._fit[in_grid] < contend_fit).any(axis=1)
+            higher_fit = (self._fit[in_grid] > contend_fit).any(axis=1)
+            if (lower_fit & ~higher_fit).any():
+                return False
+
+            # Of the non-dominated solutions, the closest to the grid is taken:
+            underdogs = higher_fit & ~lower_fit
+            if not underdogs.all():
+                in_grid = in_grid[~underdogs]
+                dist_squares = ((self._fit[in_grid] - \
+                    self._corners(self._boxes[:,in_grid].T))**2).sum(axis=1)
+                if (dist_squares < \
+                    ((contend_fit - self._corners(box))**2).sum()).any():
+                    return False
+
+        # Exclude the members of the contender's box and of boxes it dominates.
+        # Going from the end, the members moved into a removed one's place are
+        # never removed themselves.
+        for pos in N.nonzero(~better)[0][::-1]:
+            self._remove(pos)
+
+        self._append(genes, contend_fit, box)
+        return True
+
+    def select(self, rng=None):
+        """Selects for breeding an individual from the archive. Currently selects
+        randomly.
+
+        Arguments:
+        rng - what to draw random numbers from: a numpy Generator, a
+            RandomStream, or None for the global numpy random state.
+
+        Returns:
+        the index of the selected member in the archive's arrays.
+        """
+        rng = N.random if rng is None else rng
+        return int(rng.random()*self._size)
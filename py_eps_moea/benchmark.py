@@ -0,0 +1,312 @@
+# Performance benchmarks for the epsilon-moea implementation. Run this module
+# with python -m, e.g. from the repository root:
+#
+#   python -m py_eps_moea.benchmark [suite ...] [--quick] 
+#       [--output results.json] [--compare old_results.json]
+#
+# or as eps_moea.benchmark where the package is installed. Suites are: 
+# pareto_front, pareto_pairwise, archive_accept, pop_accept, breed, optimize 
+# and imports (the default is all but pareto_pairwise, which times the
+# original quadratic pareto_front() as a baseline). Each case reports the best
+# wall time of a few repetitions, a throughput (individuals, contenders,
+# offsprings or evaluations per second) and the peak memory allocated during
+# one run. Results can be stored as JSON and compared with an earlier run,
+# e.g. of a previous version.
+
+import os
+import sys
+import time
+import subprocess
+import json
+import platform
+from functools import partial
+import numpy as N
+
+from .eps_moea import pareto_front, pop_accept, eps_moea_optimize
+from .archive import EpsArchive, grid_boxes
+from .dominance import DominanceIndex
+from .creature import Creature
+from .stats import RunStats
+from .test_functions import tau1, dtlz2
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+def pareto_front_pairwise(fitness):
+    """The original O(p^2) pareto_front(), testing every individual against all
+    the others. Kept as the baseline to compare against.
+    """
+    pf = N.empty(fitness.shape[0], dtype=bool)
+
+    for subject in range(fitness.shape[0]):
+        others = fitness[N.r_[:subject, (subject+1):fitness.shape[0]]]
+        non_dominated = (fitness[subject] < others).any(axis=1) | \
+            (fitness[subject] <= others).all(axis=1)
+        pf[subject] = non_dominated.all()
+
+    return pf
+
+def best_time(func, args, repeat=3):
+    """Run func(*args) repeat times, return the shortest wall time."""
+    best = None
+    for rep in range(repeat):
+        start = time.time()
+        func(*args)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+def peak_memory(func, args):
+    """Peak memory in bytes allocated while running func(*args) once, or None
+    where it can't be traced.
+    """
+    if tracemalloc is None:
+        return None
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def measure(name, params, items, func, args, repeat=3):
+    """Time a benchmark case and make its result record.
+
+    Arguments:
+    name - the suite name.
+    params - a dict of the case's parameters.
+    items - number of items (individuals, offsprings...) a run processes.
+    func, args - the code to time is func(*args).
+    repeat - number of timed runs, of which the best is kept.
+    """
+    seconds = best_time(func, args, repeat)
+    return dict(name=name, params=params, seconds=seconds,
+        per_sec=items/seconds if seconds else None,
+        peak_bytes=peak_memory(func, args))
+
+def front_sample(num_subjects, num_targets, chrom_len=12):
+    """Fitness of random DTLZ2 solutions, near but not on the front."""
+    contenders = N.random.random_sample((num_subjects, chrom_len))
+    contenders[:,num_targets - 1:] = 0.5 + \
+        0.1*(contenders[:,num_targets - 1:] - 0.5)
+    return dtlz2(contenders, num_targets)
+
+def bench_pareto_front(quick=False):
+    sizes = (1000, 10000) if quick else (1000, 10000, 100000)
+    for num_targets in (2, 3, 5, 10):
+        for num_subjects in sizes:
+            fitness = N.random.random_sample((num_subjects, num_targets))
+            yield measure('pareto_front', dict(p=num_subjects, t=num_targets),
+                num_subjects, pareto_front, (fitness,))
+
+def bench_pareto_pairwise(quick=False):
+    sizes = (100, 1000) if quick else (100, 1000, 10000)
+    for num_targets in (2, 3, 5, 10):
+        for num_subjects in sizes:
+            fitness = N.random.random_sample((num_subjects, num_targets))
+            yield measure('pareto_pairwise', dict(p=num_subjects,
+                t=num_targets), num_subjects, pareto_front_pairwise,
+                (fitness,), repeat=1)
+
+def _accept_all(fitness, boxes, members, contenders, cont_boxes, grid):
+    # Genes don't matter to the acceptance test, fitness will do.
+    archive = EpsArchive(fitness[members], fitness[members], boxes[members],
+        grid=grid)
+    for contend_fit, box in zip(contenders, cont_boxes):
+        archive.accept(contend_fit, contend_fit, box)
+
+def bench_archive_accept(quick=False):
+    num_contenders = 200 if quick else 1000
+    for num_targets in (2, 3, 5, 8, 10):
+        for grid_size in (0.1, 0.01):
+            fitness = front_sample(5000, num_targets)
+            boxes = grid_boxes(fitness, grid_size)
+            members = pareto_front(fitness)
+            contenders = front_sample(num_contenders, num_targets)
+            cont_boxes = grid_boxes(contenders, grid_size)
+
+            record = measure('archive_accept', dict(t=num_targets,
+                grid=grid_size), num_contenders, _accept_all,
+                (fitness, boxes, members, contenders, cont_boxes, grid_size))
+            record['archive_size'] = int(members.sum())
+            yield record
+
+def _pop_accept_all(fitness, contenders):
+    fitness = fitness.copy()
+    for contend_fit in contenders:
+        repl = pop_accept(fitness, contend_fit)
+        if repl is not None:
+            fitness[repl] = contend_fit
+
+def _index_accept_all(fitness, contenders):
+    index = DominanceIndex(fitness.copy())
+    for contend_fit in contenders:
+        repl = index.accept(contend_fit)
+        if repl is not None:
+            index.replace(repl, contend_fit)
+
+def bench_pop_accept(quick=False):
+    """Contenders accepted in turn, replacing population members, by
+    pop_accept() and by a DominanceIndex (including building it).
+    """
+    num_contenders = 200 if quick else 1000
+    for num_targets in (2, 5):
+        for pop_size in (100, 1000, 10000):
+            fitness = front_sample(pop_size, num_targets)
+            contenders = front_sample(num_contenders, num_targets)
+            yield measure('pop_accept', dict(p=pop_size, t=num_targets),
+                num_contenders, _pop_accept_all, (fitness, contenders))
+            yield measure('pop_accept', dict(p=pop_size, t=num_targets,
+                method='index'), num_contenders, _index_accept_all,
+                (fitness, contenders))
+
+def _breed_pairs(creature, mamas, papas):
+    for mama, papa in zip(mamas, papas):
+        creature.breed(mama, papa)
+
+def bench_breed(quick=False):
+    num_pairs = 100 if quick else 1000
+    for chrom_len in (10, 30, 100, 1000):
+        creature = Creature(N.zeros(chrom_len), N.ones(chrom_len), 1./chrom_len)
+        mamas = N.random.random_sample((num_pairs, chrom_len))
+        papas = N.random.random_sample((num_pairs, chrom_len))
+
+        yield measure('breed', dict(c=chrom_len, method='breed'),
+            2*num_pairs, _breed_pairs, (creature, mamas, papas))
+        yield measure('breed', dict(c=chrom_len, method='breed_many'),
+            2*num_pairs, creature.breed_many, (mamas, papas))
+
+def _optimize(creature, pop_size, num_gens, objectives, grid, stats):
+    eps_moea_optimize(creature, pop_size, num_gens, num_gens, objectives, grid,
+        stats=stats)
+
+def bench_optimize(quick=False):
+    """Full runs, sweeping one parameter at a time away from a base case of
+    100 individuals, 30 genes, 2 targets (TZD1) and a 0.01 grid.
+    """
+    num_gens = 500 if quick else 5000
+    base = dict(p=100, c=30, t=2, grid=0.01)
+    cases = [base]
+    for key, values in (('p', (1000, 10000)), ('c', (10, 100)),
+        ('t', (3, 5, 8)), ('grid', (0.1, 0.001))):
+        for value in values:
+            case = dict(base)
+            case[key] = value
+            cases.append(case)
+
+    for case in cases:
+        objectives = tau1 if case['t'] == 2 else \
+            partial(dtlz2, num_targets=case['t'])
+        creature = Creature(N.zeros(case['c']), N.ones(case['c']),
+            1./case['c'])
+        grid = N.ones(case['t'])*case['grid']
+        stats = RunStats()
+        args = (creature, case['p'], num_gens, objectives, grid)
+
+        seconds = best_time(_optimize, args + (stats,), repeat=1)
+        yield dict(name='optimize', params=case, seconds=seconds,
+            per_sec=stats.evaluations/seconds, phases=stats.times,
+            peak_bytes=peak_memory(_optimize, args + (RunStats(),)))
+
+def _import_time(statement, path):
+    """Wall time of a fresh interpreter running an import statement."""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([path] + \
+        [env['PYTHONPATH']] if env.get('PYTHONPATH') else [path])
+    start = time.time()
+    subprocess.check_call([sys.executable, '-c', statement], env=env)
+    return time.time() - start
+
+def bench_imports(quick=False):
+    """Startup of a new process importing the package, as every worker
+    process does, against that of the bare interpreter and of numpy alone. 
+    Importing the package should cost next to nothing, and getting the 
+    optimizer little more than numpy.
+    """
+    repeat = 5 if quick else 20
+    package = __package__ or 'eps_moea'
+    path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for what, statement in (('python', 'pass'), ('numpy', 'import numpy'),
+        ('package', 'import %s' % package), 
+        ('optimizer', 'from %s import eps_moea_optimize' % package)):
+        seconds = best_time(_import_time, (statement, path), repeat)
+        yield dict(name='imports', params=dict(what=what), seconds=seconds,
+            per_sec=1./seconds, peak_bytes=None)
+
+suites = dict(pareto_front=bench_pareto_front,
+    pareto_pairwise=bench_pareto_pairwise,
+    archive_accept=bench_archive_accept, pop_accept=bench_pop_accept,
+    breed=bench_breed, optimize=bench_optimize, imports=bench_imports)
+default_suites = ('pareto_front', 'archive_accept', 'pop_accept', 'breed',
+    'optimize', 'imports')
+
+def _case_key(record):
+    return record['name'], tuple(sorted(record['params'].items()))
+
+def run(names=default_suites, quick=False, compare=None):
+    """Run benchmark suites, printing each result as it comes.
+
+    Arguments:
+    names - the names of suites to run.
+    quick - run smaller cases, for a fast check.
+    compare - optional results dict from an earlier run; the time ratio of
+        matching cases is printed (above 1 is slower now).
+
+    Returns:
+    results - a dict with some information about the environment and a list
+        of result records.
+    """
+    previous = {}
+    if compare is not None:
+        previous = dict((_case_key(record), record) \
+            for record in compare['records'])
+
+    records = []
+    for name in names:
+        for record in suites[name](quick):
+            records.append(record)
+            params = ' '.join('%s=%s' % item \
+                for item in sorted(record['params'].items()))
+            line = "%-16s %-32s %10.4f s %12.1f /s" % (name, params,
+                record['seconds'], record['per_sec'])
+            if record['peak_bytes'] is not None:
+                line += " %9.1f MB" % (record['peak_bytes']/2.**20)
+            if _case_key(record) in previous:
+                line += " x%.2f" % \
+                    (record['seconds']/previous[_case_key(record)]['seconds'])
+            print(line)
+            sys.stdout.flush()
+
+    return dict(python=platform.python_version(), numpy=N.__version__,
+        machine=platform.machine(), time=time.time(), quick=quick,
+        records=records)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark eps-moea.")
+    parser.add_argument('suites', nargs='*', metavar='suite',
+        help="suites to run: %s" % ', '.join(sorted(suites)))
+    parser.add_argument('--quick', action='store_true',
+        help="run smaller cases")
+    parser.add_argument('--output', help="save results as JSON to this file")
+    parser.add_argument('--compare',
+        help="JSON results of an earlier run to compare against")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    for name in args.suites:
+        if name not in suites:
+            parser.error("unknown suite: %s" % name)
+
+    N.random.seed(args.seed)
+    compare = None
+    if args.compare:
+        with open(args.compare) as saved:
+            compare = json.load(saved)
+
+    results = run(args.suites or default_suites, args.quick, compare)
+    if args.output:
+        with open(args.output, 'w') as out:
+            json.dump(results, out, indent=1)
@@ -0,0 +1,98 @@
+# A bounded cache of objective values, keyed on the chromosome.
+#
+# Offspring are often exact copies of a parent or of earlier offspring (genes
+# too close for recombination, mutation not firing), and need not be sent to
+# the objectives again. The least recently used entries are evicted once the
+# cache is full.
+
+from collections import OrderedDict
+import numpy as N
+
+class EvaluationCache(object):
+    def __init__(self, max_size, quantum=None):
+        """
+        Arguments:
+        max_size - maximal number of chromosomes whose fitness is kept.
+        quantum - if given, chromosomes are matched after rounding each gene
+            to a multiple of quantum (scalar, or one per gene), instead of
+            exactly.
+        """
+        self.max_size = max_size
+        self.quantum = quantum
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _key(self, genes):
+        if self.quantum is None:
+            return genes.tobytes()
+        return N.floor(genes/self.quantum + 0.5).astype(N.int64).tobytes()
+
+    def lookup(self, chromosomes):
+        """Find which of a group of chromosomes have their fitness cached.
+
+        Arguments:
+        chromosomes - an n by c array of genes.
+
+        Returns:
+        keys - the cache key of each chromosome.
+        cached - for each chromosome, its fitness vector or None.
+        missing - indices of the chromosomes that must be evaluated. A
+            chromosome repeated in the group appears only once.
+        """
+        keys = [self._key(genes) for genes in chromosomes]
+        cached = []
+        missing = []
+        first_seen = set()
+        for ix, key in enumerate(keys):
+            fit = self._entries.pop(key, None)
+            if fit is None:
+                if key not in first_seen:
+                    first_seen.add(key)
+                    missing.append(ix)
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            else:
+                self._entries[key] = fit # most recently used.
+                self.hits += 1
+            cached.append(fit)
+
+        return keys, cached, missing
+
+    def complete(self, keys, cached, missing, fitness):
+        """Store the fitness of the chromosomes that lookup() found missing,
+        and return the fitness of the whole group.
+
+        Arguments:
+        keys, cached, missing - as returned by lookup().
+        fitness - the fitness of the missing chromosomes, in order.
+
+        Returns:
+        an n by t fitness array for all the chromosomes given to lookup().
+        """
+        fresh = {}
+        for ix, fit in zip(missing, fitness):
+            fresh[keys[ix]] = fit.copy()
+            self._entries[keys[ix]] = fresh[keys[ix]]
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+        return N.array([fresh[key] if fit is None else fit \
+            for key, fit in zip(keys, cached)])
+
+    def evaluate(self, objectives, chromosomes):
+        """Get the fitness of chromosomes, calling objectives once on those
+        not in the cache.
+
+        Arguments:
+        objectives - a function that given a population array returns the
+            fitness array.
+        chromosomes - an n by c array of genes.
+        """
+        keys, cached, missing = self.lookup(chromosomes)
+        fitness = objectives(chromosomes[missing]) if missing else []
+        return self.complete(keys, cached, missing, fitness)
@@ -0,0 +1,170 @@
+# Periodic checkpointing of an optimization run, so that it can be resumed
+# after an interruption.
+#
+# A checkpoint is a directory with two copies of the state. The large
+# population and fitness arrays are .npy files, of which only the rows that
+# changed since a copy was last written are written again, in place. The
+# rest of the state is small and goes to an .npz file next to them. A pointer
+# file, replaced atomically after a copy is complete, says which copy is
+# current, so an interruption while writing leaves the other copy usable.
+# Everything in a copy is synced to disk before the pointer names it, and 
+# the directory is synced after every rename, so this also holds when the
+# whole system crashes.
+
+import os
+import time
+import numpy as N
+from numpy.lib import format
+
+_replace = getattr(os, 'replace', os.rename)
+
+def _current_copy(path):
+    """Which of the two copies in the checkpoint directory is consistent, or
+    None if no checkpoint was completed there yet.
+    """
+    try:
+        with open(os.path.join(path, 'current')) as pointer:
+            return int(pointer.read())
+    except IOError:
+        return None
+
+def _sync_dir(path):
+    """Sync a directory's entries (e.g. renames) to disk, where directories
+    can be opened for that.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return # e.g. on Windows.
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _write_rows(filename, arr, rows):
+    """Write some rows of a 2D array into an existing .npy file of the same 
+    shape and type, and sync it to disk. If rows is None, the file is written 
+    anew with the whole array.
+    """
+    with open(filename, 'wb' if rows is None else 'r+b') as npy:
+        if rows is None:
+            N.save(npy, arr)
+        else:
+            if format.read_magic(npy) == (1, 0):
+                format.read_array_header_1_0(npy)
+            else:
+                format.read_array_header_2_0(npy)
+            
+            data_start = npy.tell()
+            row_bytes = arr.shape[1]*arr.itemsize
+            for row in N.nonzero(rows)[0]:
+                npy.seek(data_start + row*row_bytes)
+                npy.write(arr[row].tobytes())
+        
+        npy.flush()
+        os.fsync(npy.fileno())
+
+class Checkpointer(object):
+    def __init__(self, path, every_gens=None, every_secs=None):
+        """
+        Arguments:
+        path - the checkpoint directory. Created if it does not exist.
+        every_gens - save after at least this many iterations since the last
+            save.
+        every_secs - save after at least this many seconds since the last save.
+            If both are None, saves after every batch.
+        """
+        self._path = path
+        self._every_gens = every_gens
+        self._every_secs = every_secs
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        current = _current_copy(path)
+        self._next = 0 if current == 1 else 1
+        self._stale = [None, None] # rows to rewrite in each copy; None is all.
+        self._last_gens = None
+        self._last_time = time.time()
+
+    def due(self, gens_left):
+        """Whether a save is due, given the number of iterations remaining. If
+        it is, the next one is counted from now.
+        """
+        now = time.time()
+        if self._last_gens is None:
+            self._last_gens = gens_left
+
+        if (self._every_gens is None and self._every_secs is None) or \
+            (self._every_gens is not None and \
+                self._last_gens - gens_left >= self._every_gens) or \
+            (self._every_secs is not None and \
+                now - self._last_time >= self._every_secs):
+            self._last_gens = gens_left
+            self._last_time = now
+            return True
+        return False
+
+    def save(self, population, fitness, changed, **state):
+        """Write the state into the non-current copy and make it current.
+
+        Arguments:
+        population, fitness - the population arrays.
+        changed - a length-p boolean vector marking the population rows
+            changed since the last save. It is cleared.
+        state - other arrays (or scalars) to save, small compared to the
+            population.
+        """
+        for copy in range(2):
+            if self._stale[copy] is not None:
+                self._stale[copy] |= changed
+        changed[:] = False
+
+        copy = self._next
+        stale = self._stale[copy]
+        for name, arr in (('population', population), ('fitness', fitness)):
+            _write_rows(os.path.join(self._path, '%s.%d.npy' % (name, copy)),
+                N.ascontiguousarray(arr), stale)
+
+        # Write to a temporary name so that the whole file is either there
+        # or not.
+        state_file = os.path.join(self._path, 'state.%d.npz' % copy)
+        with open(state_file + '.tmp.npz', 'wb') as tmp:
+            N.savez(tmp, **state)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        _replace(state_file + '.tmp.npz', state_file)
+        _sync_dir(self._path)
+
+        pointer = os.path.join(self._path, 'current')
+        with open(pointer + '.tmp', 'w') as tmp:
+            tmp.write(str(copy))
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        _replace(pointer + '.tmp', pointer)
+        _sync_dir(self._path)
+
+        self._stale[copy] = N.zeros(len(population), dtype=bool)
+        self._next = 1 - copy
+
+def load_checkpoint(path):
+    """Read the current copy of a checkpoint written by a Checkpointer.
+
+    Arguments:
+    path - the checkpoint directory.
+
+    Returns:
+    state - a dict with the population and fitness arrays, and the other
+        state arrays given to Checkpointer.save().
+    """
+    copy = _current_copy(path)
+    if copy is None:
+        raise IOError("No complete checkpoint in %s" % path)
+
+    with N.load(os.path.join(path, 'state.%d.npz' % copy)) as saved:
+        state = dict(saved)
+    for name in ('population', 'fitness'):
+        state[name] = N.array(N.load(
+            os.path.join(path, '%s.%d.npy' % (name, copy)), mmap_mode='r'))
+    return state
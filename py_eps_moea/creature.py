@@ -4,7 +4,6 @@
 # [1] Kalyanmoy Deb, An efficient constraint handling method for genetic 
 # algorithms, 31 May 2000
 
-from numpy import random
 import numpy as N
 
 class Creature(object):
@@ -56,26 +55,32 @@ class Creature(object):
         """
         return value*self._ranges[gene] + self._low_bnds[gene]
         
-    def gen_population(self, num_subjects):
-        pop = random.random_sample((num_subjects, self.chromosome_len()))
+    def gen_population(self, num_subjects, rng=None):
+        """Uniformly random chromosomes within the bounds. rng is what to draw
+        from, as for breed().
+        """
+        rng = N.random if rng is None else rng
+        pop = rng.random((num_subjects, self.chromosome_len()))
         return self.denormalize(pop)
     
-    def sbx(self, mama, papa):
+    def sbx(self, mama, papa, rng=None):
         """Create an offspring using simulated binary crossover.
         
         Arguments: 
         mama, papa - two breeders from the population, each a vector of genes.
+        rng - what to draw random numbers from, as for breed().
         
         Returns: 
         offsprings - a 2-tuple of length-g arrays, each with the genotype of an 
             offspring after recombination and mutation.
         """
+        rng = N.random if rng is None else rng
         offsprings = [mama.copy(), papa.copy()]
         
-        if random.rand() <= self._p_recomb:
-            recombed = (random.rand(self.chromosome_len()) <= 0.5) & (abs(mama - papa) > 1e-14)
+        if rng.random() <= self._p_recomb:
+            recombed = (rng.random(self.chromosome_len()) <= 0.5) & (abs(mama - papa) > 1e-14)
             num_recombed = recombed.sum()
-            cum_dist = random.rand(2, num_recombed)
+            cum_dist = rng.random((2, num_recombed))
             
             parents = N.vstack((mama[recombed], papa[recombed]))
             p_spread = abs(mama[recombed] - papa[recombed])
@@ -92,8 +97,7 @@ class Creature(object):
             spread[expanding] = \
                 (2 - correction[expanding]*cum_dist[expanding])**(-1./(self._et_c + 1))
             
-            pm = random.random_integers(0, 1, num_recombed)
-            pm[pm == 0] = -1
+            pm = N.where(rng.random(num_recombed) < 0.5, -1, 1)
             recombed_traits = 0.5*(mama[recombed] + papa[recombed] + pm*spread*p_spread)
             
             underflow = N.where(recombed_traits < self._low_bnds[recombed])
@@ -102,7 +106,7 @@ class Creature(object):
             recombed_traits[overflow] = N.tile(self._up_bnds[recombed],(2,1))[overflow]
             
             # Merge into not recombined traits from one of the parents:
-            which_recombed = random.random_integers(0, 1, num_recombed)
+            which_recombed = rng.random(num_recombed) < 0.5
             offsprings[0][recombed] = N.where(which_recombed, \
                 recombed_traits[0], recombed_traits[1])
             offsprings[1][recombed] = N.where(which_recombed, \
@@ -110,24 +114,27 @@ class Creature(object):
             
         return offsprings
         
-    def breed(self, mama, papa):
+    def breed(self, mama, papa, rng=None):
         """Creates a new genome for a subject by recombination of parent genes, and
         possibly mutation of the result, depending on the creature's mutation 
         resistance.
         
         Arguments: 
         mama, papa - two breeders from the population, each a vector of genes.
+        rng - what to draw random numbers from: a numpy Generator, a 
+            RandomStream, or None for the global numpy random state.
         
         Returns: 
         offspring - a length-g array with the genotype of the offspring after 
             recombination and mutation.
         """
         # Recombination place, using one-point crossover:
-        offsprings = self.sbx(mama, papa)
+        rng = N.random if rng is None else rng
+        offsprings = self.sbx(mama, papa, rng)
         
         # Possibly mutate:
         for offspring in offsprings:
-            which_genes = N.random.rand(self.chromosome_len()) <= self._p_mute
+            which_genes = rng.random(self.chromosome_len()) <= self._p_mute
             if not any(which_genes):
                 continue
         
@@ -136,16 +143,14 @@ class Creature(object):
                 self._up_bnds[which_genes] - offspring[which_genes])) \
                 / self._ranges[which_genes]
                 
-            mute_bases = N.random.random_sample(which_genes.sum())
+            mute_bases = rng.random(which_genes.sum())
             perturb = N.empty_like(mute_bases)
             close = mute_bases <= 0.5
-            close_ind = N.where(close)
-            far_ind = N.where(~close)
             
             perturb[close] = (2*mute_bases[close] + \
-                (1 - 2*mute_bases[close])*delta[0,close_ind]**(self._et_m + 1))**(1./(self._et_m + 1)) - 1
+                (1 - 2*mute_bases[close])*delta[0,close]**(self._et_m + 1))**(1./(self._et_m + 1)) - 1
             perturb[~close] = 1 - (2*(1 - mute_bases[~close]) + \
-                2*(mute_bases[~close] - 0.5)*delta[1,far_ind]**(self._et_m + 1))**(1./(self._et_m + 1))
+                2*(mute_bases[~close] - 0.5)*delta[1,~close]**(self._et_m + 1))**(1./(self._et_m + 1))
             offspring[which_genes] += perturb*self._ranges[which_genes]
             
             underflow = offspring < self._low_bnds
@@ -154,3 +159,69 @@ class Creature(object):
             offspring[overflow] = self._up_bnds[overflow]
             
         return offsprings
+    
+    def breed_many(self, mamas, papas, rng=None):
+        """Like breed(), for many pairs of parents at once. The same simulated 
+        binary crossover and polynomial mutation are done on the whole arrays
+        instead of pair by pair.
+        
+        Arguments:
+        mamas, papas - k by c arrays, row i of each being a pair of breeders.
+        rng - what to draw random numbers from, as for breed().
+        
+        Returns:
+        offsprings - a 2k by c array, rows 2i and 2i+1 being the offsprings of
+            the ith pair, after recombination and mutation.
+        """
+        rng = N.random if rng is None else rng
+        num_pairs = mamas.shape[0]
+        offsprings = N.empty((2*num_pairs, self.chromosome_len()))
+        offsprings[0::2] = mamas
+        offsprings[1::2] = papas
+        
+        # Recombination, see sbx():
+        recombed = (rng.random((num_pairs, self.chromosome_len())) <= 0.5) & \
+            (abs(mamas - papas) > 1e-14) & \
+            (rng.random(num_pairs) <= self._p_recomb)[:,None]
+        genes = N.nonzero(recombed)[1]
+        num_recombed = len(genes)
+        
+        mama, papa = mamas[recombed], papas[recombed]
+        low_bnds, up_bnds = self._low_bnds[genes], self._up_bnds[genes]
+        p_spread = abs(mama - papa)
+        correction = 2 - (1 + N.vstack((N.minimum(mama, papa) - low_bnds, 
+            up_bnds - N.maximum(mama, papa)))/p_spread)**-(self._et_c + 1.)
+        
+        cum_dist = rng.random((2, num_recombed))
+        spread = N.where(cum_dist <= 1./correction, 
+            (correction*cum_dist)**(1./(self._et_c + 1)),
+            (2 - correction*cum_dist)**(-1./(self._et_c + 1)))
+        
+        pm = N.where(rng.random(num_recombed) < 0.5, -1, 1)
+        recombed_traits = N.clip(0.5*(mama + papa + pm*spread*p_spread), 
+            low_bnds, up_bnds)
+        
+        # Merge into not recombined traits from one of the parents:
+        which_recombed = rng.random(num_recombed) < 0.5
+        offsprings[0::2][recombed] = N.where(which_recombed, \
+            recombed_traits[0], recombed_traits[1])
+        offsprings[1::2][recombed] = N.where(which_recombed, \
+            recombed_traits[1], recombed_traits[0])
+        
+        # Polinomial mutation, see breed():
+        mutated = rng.random(offsprings.shape) <= self._p_mute
+        genes = N.nonzero(mutated)[1]
+        low_bnds, up_bnds = self._low_bnds[genes], self._up_bnds[genes]
+        ranges = self._ranges[genes]
+        traits = offsprings[mutated]
+        
+        mute_bases = rng.random(len(genes))
+        exponent = self._et_m + 1.
+        perturb = N.where(mute_bases <= 0.5,
+            (2*mute_bases + (1 - 2*mute_bases)* \
+                (1 - (traits - low_bnds)/ranges)**exponent)**(1./exponent) - 1,
+            1 - (2*(1 - mute_bases) + 2*(mute_bases - 0.5)* \
+                (1 - (up_bnds - traits)/ranges)**exponent)**(1./exponent))
+        offsprings[mutated] = N.clip(traits + perturb*ranges, low_bnds, up_bnds)
+        
+        return offsprings
@@ -0,0 +1,108 @@
+# An index over the population fitness, for the population acceptance test.
+#
+# For each objective, the population is kept sorted by its value. The members
+# a contender dominates are all in the tail, beyond the contender's value, of
+# each of these orders, and those dominating it are in the head. The shortest
+# of the tails (or heads) gives the candidates, which are then filtered by the
+# other objectives one at a time, so that a test only looks at the members
+# that are near enough to matter, instead of comparing the contender with the
+# whole population. Replacing an individual moves one entry in each order.
+
+import numpy as N
+
+class DominanceIndex(object):
+    def __init__(self, fitness):
+        """
+        Arguments:
+        fitness - a p by t array, the fitness of the population. It is kept
+            (not copied), and must afterwards only be changed through
+            replace().
+        """
+        self.fitness = fitness
+        self._order = N.argsort(fitness, axis=0, kind='mergesort').T.copy()
+        self._sorted = N.array([fitness[order, target] \
+            for target, order in enumerate(self._order)])
+
+    def underdogs(self, contend_fit):
+        """Find the members of the population dominated by a contender.
+
+        Arguments:
+        contend_fit - a length t vector with the contender's fitness.
+
+        Returns:
+        the indices of the dominated members, in ascending order.
+        """
+        starts = [N.searchsorted(values, value, 'left') \
+            for values, value in zip(self._sorted, contend_fit)]
+        targets = N.argsort(starts, kind='mergesort')[::-1]
+        candidates = self._order[targets[0]][starts[targets[0]]:]
+        for target in targets[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = candidates[
+                self.fitness[candidates, target] >= contend_fit[target]]
+
+        # Weakly dominated candidates, but equal ones are not dominated:
+        if len(candidates):
+            candidates = candidates[
+                (self.fitness[candidates] != contend_fit).any(axis=1)]
+        return N.sort(candidates)
+
+    def dominated(self, contend_fit):
+        """Whether any member of the population dominates a contender."""
+        ends = [N.searchsorted(values, value, 'right') \
+            for values, value in zip(self._sorted, contend_fit)]
+        targets = N.argsort(ends, kind='mergesort')
+        candidates = self._order[targets[0]][:ends[targets[0]]]
+        for target in targets[1:]:
+            if len(candidates) == 0:
+                return False
+            candidates = candidates[
+                self.fitness[candidates, target] <= contend_fit[target]]
+
+        return bool(len(candidates)) and \
+            (self.fitness[candidates] != contend_fit).any(axis=1).any()
+
+    def accept(self, contend_fit, rng=None):
+        """Same as pop_accept() on the indexed fitness, including the random
+        choices made from rng.
+
+        Returns:
+        repl - the index of the subject to replace, or None if the contender
+            is rejected. The replacement must then be given with replace().
+        """
+        rng = N.random if rng is None else rng
+        underdogs = self.underdogs(contend_fit)
+        if len(underdogs):
+            return underdogs[int(rng.random()*len(underdogs))]
+        if self.dominated(contend_fit):
+            return None
+        return int(rng.random()*self.fitness.shape[0])
+
+    def replace(self, slot, fit):
+        """Give an individual of the population a new fitness, updating the
+        fitness array and the index.
+
+        Arguments:
+        slot - index of the individual in the population.
+        fit - its new fitness vector.
+        """
+        for target, (values, order) in enumerate(zip(self._sorted,
+            self._order)):
+            old = self.fitness[slot, target]
+            low = N.searchsorted(values, old, 'left')
+            high = N.searchsorted(values, old, 'right')
+            pos = low + N.nonzero(order[low:high] == slot)[0][0]
+
+            new_pos = N.searchsorted(values, fit[target], 'left')
+            if new_pos > pos:
+                new_pos -= 1
+                values[pos:new_pos] = values[pos + 1:new_pos + 1]
+                order[pos:new_pos] = order[pos + 1:new_pos + 1]
+            elif new_pos < pos:
+                values[new_pos + 1:pos + 1] = values[new_pos:pos].copy()
+                order[new_pos + 1:pos + 1] = order[new_pos:pos].copy()
+            values[new_pos] = fit[target]
+            order[new_pos] = slot
+
+        self.fitness[slot] = fit
@@ -1,15 +1,25 @@
 # See the documentation of eps_moea_optimize() for details.
 #
-# Includes a test program. Just run this module as a script and see.
+# Includes a test program. Just run this module with python -m and see.
 # Giving one integer argument to the script runs it on test problem TZDn
 # where n is the argument. For example:
 #
-#   python eps_moea_optimize.py 3 
+#   python -m eps_moea.eps_moea 3
 #
 # Will do TZD3.
 # See the test_functions module for details on the TZD problems.
 
+from collections import namedtuple
 import numpy as N
+from .archive import EpsArchive, grid_boxes
+from .checkpoint import load_checkpoint
+from .dominance import DominanceIndex
+from .history import ARCHIVED, REPLACED, MIGRATED
+from .streams import RandomStream
+
+# From this population size, the population acceptance test is faster with a
+# DominanceIndex than comparing with the whole population.
+_INDEXED_POP_SIZE = 1000
 
 def pareto_front(fitness):
     """Given multiple fitness values of a population, find which individuals are in 
@@ -17,6 +27,12 @@ def pareto_front(fitness):
     Assumes the problem is in canonical form, i.e. the target functions are all to 
     be minimized.
     
+    The population is sorted lexicographically, so that anyone dominating an 
+    individual precedes it. Then two and three targets are done by a sweep in
+    O(p log p). More targets are first sorted by the sum of targets, which 
+    keeps that order, and then compared in blocks to the part of the front 
+    found so far.
+    
     Arguments:
     fitness - a p by t array, where fitness(p,t) is the value of function t for 
         individual p.
@@ -24,83 +40,207 @@ def pareto_front(fitness):
     Returns:
     pf - a boolean vector of length p, saying which individual is in the front.
     """
-    pf = N.empty(fitness.shape[0], dtype=N.bool)
+    num_subjects, num_targets = fitness.shape
+    pf = N.empty(num_subjects, dtype=bool)
+    if num_subjects == 0:
+        return pf
     
-    for subject in xrange(fitness.shape[0]):
-        others = fitness[N.r_[:subject, (subject+1):fitness.shape[0]]]
-        non_dominated = (fitness[subject] < others).any(axis=1) | \
-            (fitness[subject] <= others).all(axis=1)
-        pf[subject] = non_dominated.all()
-        
+    keys = fitness.T[::-1]
+    if num_targets > 3:
+        keys = N.vstack((keys, fitness.sum(axis=1)))
+    order = N.lexsort(keys)
+    ordered = fitness[order]
+    
+    # Identical individuals do not dominate each other, so only one 
+    # representative of each is tested.
+    first = N.ones(num_subjects, dtype=bool)
+    first[1:] = (ordered[1:] != ordered[:-1]).any(axis=1)
+    unique = ordered[first]
+    
+    if num_targets == 2:
+        non_dominated = _front_sweep_2d(unique)
+    elif num_targets == 3:
+        non_dominated = _front_sweep_3d(unique)
+    else:
+        non_dominated = _front_blocked(unique)
+    
+    pf[order] = non_dominated[N.cumsum(first) - 1]
     return pf
 
-def pop_select(fitness, archive):
+def _front_sweep_2d(unique):
+    """Non-domination of lexicographically sorted, unique 2-target fitness rows.
+    A row is dominated iff some previous row is not worse on the second target.
+    """
+    best = N.minimum.accumulate(unique[:,1])
+    non_dominated = N.ones(len(unique), dtype=bool)
+    non_dominated[1:] = unique[1:,1] < best[:-1]
+    return non_dominated
+
+def _front_sweep_3d(unique):
+    """Non-domination of lexicographically sorted, unique 3-target fitness rows.
+    Keeps the non-dominated staircase of the last two targets over the rows 
+    seen so far (second target ascending, third descending), and tests each 
+    row against it by bisection.
+    """
+    from bisect import bisect_right
+    non_dominated = N.zeros(len(unique), dtype=bool)
+    stair_y = []
+    stair_neg_z = [] # ascending, for bisection.
+    
+    for row, (y, z) in enumerate(unique[:,1:].tolist()):
+        pos = bisect_right(stair_y, y)
+        if pos and -stair_neg_z[pos - 1] <= z:
+            continue
+        non_dominated[row] = True
+        
+        # Remove whatever the new row dominates on the staircase:
+        if pos and stair_y[pos - 1] == y:
+            pos -= 1
+        end = bisect_right(stair_neg_z, -z, pos)
+        stair_y[pos:end] = [y]
+        stair_neg_z[pos:end] = [-z]
+        
+    return non_dominated
+
+def _front_blocked(unique, block=256, max_cmp=2**18):
+    """Non-domination of unique fitness rows for any number of targets, sorted 
+    so that dominating rows come first. Blocks of rows are compared to the 
+    front found in the rows preceding them, then among themselves, one target
+    at a time and with at most max_cmp comparisons per temporary array. Rows
+    are dropped from the comparison as soon as they are found dominated.
+    """
+    num_targets = unique.shape[1]
+    non_dominated = N.zeros(len(unique), dtype=bool)
+    front = N.empty((num_targets, len(unique))) # transposed, for contiguity.
+    front_size = 0
+    
+    for start in range(0, len(unique), block):
+        chunk = unique[start:start + block]
+        alive = N.arange(len(chunk))
+        
+        # Rows are unique, so "not worse anywhere" means dominating.
+        step = max(1, max_cmp // len(chunk))
+        for front_start in range(0, front_size, step):
+            others = front[:, front_start:min(front_start + step, front_size)]
+            contenders = chunk[alive]
+            not_worse = others[0] <= contenders[:,0,None]
+            for target in range(1, num_targets):
+                not_worse &= others[target] <= contenders[:,target,None]
+            alive = alive[~not_worse.any(axis=1)]
+            if len(alive) == 0:
+                break
+        
+        contenders = chunk[alive]
+        not_worse = N.tril(contenders[:,0] <= contenders[:,0,None], -1)
+        for target in range(1, num_targets):
+            not_worse &= contenders[:,target] <= contenders[:,target,None]
+        alive = alive[~not_worse.any(axis=1)]
+        
+        front[:, front_size:front_size + len(alive)] = chunk[alive].T
+        front_size += len(alive)
+        non_dominated[start + alive] = True
+    
+    return non_dominated
+
+def pop_select(fitness, archive, rng=None, violation=None):
     """Randomly mates two subjects from a population and selects the dominating
     subject. If no dominance exists, select the second one (this is arbitrary).
+    If violation is given, a subject with a smaller constraint violation 
+    dominates regardless of fitness.
     
     Arguments: 
     fitness - a p by t array, where fitness(p,t) is the value of function t for 
         individual p.
     archive - the current archive population gets immunity, this variable is a 
-        boolean vector saying which of the population is in the archive.
+        boolean vector saying which of the population is in the archive. 
+        Currently unused, and may be None.
+    rng - what to draw random numbers from: a numpy Generator, a 
+        RandomStream, or None for the global numpy random state.
+    violation - optional length p vector, the total constraint violation of 
+        each individual, 0 for the feasible ones.
     
     Returns: 
     the index of the subject selected for breeding.
     """
-    compete = N.random.random_integers(0, fitness.shape[0] - 1, size=2)
+    rng = N.random if rng is None else rng
+    compete = (rng.random(2)*fitness.shape[0]).astype(int)
     
+    if violation is not None and \
+        violation[compete[0]] != violation[compete[1]]:
+        return compete[N.argmin(violation[compete])]
     if (fitness[compete[0]] <= fitness[compete[1]]).all() and \
         (fitness[compete[0]] < fitness[compete[1]]).any():
         return compete[0]
     if (fitness[compete[1]] <= fitness[compete[0]]).all() and \
         (fitness[compete[1]] < fitness[compete[0]]).any():
         return compete[1]
-    if N.random.rand() < 0.5:
+    if rng.random() < 0.5:
         return compete[0]
     return compete[1]
 
-def archive_select(archive_marker):
+def archive_select(archive_marker, rng=None):
     """Selects for breeding an individual from the archive. Currently selects 
     randomly.
     
     Arguments:
     archive_marker - a length-p boolean vector stating which of the population
         is in the archive.
+    rng - what to draw random numbers from, as for pop_select().
     
     Returns:
     the index in the population of the selected archive member.
     """
+    rng = N.random if rng is None else rng
     return N.where(archive_marker)[0][\
-        N.random.random_integers(0, archive_marker.sum() - 1)]
+        int(rng.random()*archive_marker.sum())]
 
-def pop_accept(fitness, contend_fit):
+def pop_accept(fitness, contend_fit, rng=None, violation=None, 
+    contend_viol=0.):
     """Find some poor underdog in the population that is pareto-dominated by an 
     up-and-coming contender - if any such underdog exists. Otherwise cast away
     the contender.
     
+    With constraints, domination is constraint-domination: a smaller total
+    violation dominates, and only between equal violations (e.g. feasible 
+    individuals) does fitness decide.
+    
     Arguments:
     fitness - a p by t matrix for p subjects and t target functions. fitness(i,j)
         is the value of target function j for subject i.
     contend_fit - a 1 by t vector with the contender's fitness.
+    rng - what to draw random numbers from, as for pop_select().
+    violation - optional length p vector, the total constraint violation of 
+        each subject, 0 for the feasible ones.
+    contend_viol - the contender's total constraint violation.
     
     Returns:
     repl - the index of the replaced subject, or None if no replacement occurred
     """
+    rng = N.random if rng is None else rng
     underdogs = (contend_fit <= fitness).all(axis=1) & (contend_fit < fitness).any(axis=1)
+    if violation is not None:
+        underdogs = (contend_viol < violation) | \
+            ((contend_viol == violation) & underdogs)
     if underdogs.any():
-        repl_idx = N.random.random_integers(0, underdogs.sum() - 1)
+        repl_idx = int(rng.random()*underdogs.sum())
         return N.nonzero(underdogs)[0][repl_idx]
         
     # Is he dominated?
     top_dogs = (contend_fit >= fitness).all(axis=1) & (contend_fit > fitness).any(axis=1)
+    if violation is not None:
+        top_dogs = (violation < contend_viol) | \
+            ((violation == contend_viol) & top_dogs)
     if top_dogs.any():
         return None
     
     # Non-domination: select at random.
-    return N.random.random_integers(0, fitness.shape[0] - 1)
+    return int(rng.random()*fitness.shape[0])
         
-def archive_accept(archive, fitness, grid_fit, contend_fit, grid_cont):
+def archive_accept(archive, fitness, grid_fit, contend_fit, grid_cont, 
+    violation=None, contend_viol=0.):
     """Update the pareto-front in the archive using epsilon-dominance.
+    This is a one-off form of EpsArchive.accept(), for an archive given as a 
+    boolean mask over the population. The contender is not added to the mask.
     
     Arguments:
     archive - a p by 1 boolean array stating which individual is in the archive.
@@ -111,60 +251,563 @@ def archive_accept(archive, fitness, grid_fit, contend_fit, grid_cont):
     grid_fit - the epsilon-fitness value of the population (p by t)
     contend_fit - the fitness of the contender.
     grid_cont - a vector of length t with the epsilon-fitness of the contender
+    violation - optional length p vector, the total constraint violation of 
+        each individual, for the constraint-domination rules of 
+        EpsArchive.accept().
+    contend_viol - the contender's total constraint violation.
     
     Returns:
     accepted - a boolean value stating whether the contender was accepted.
     """
-    # We have more than one level of selection from the population,
-    # so its convenient to work with indices rather than boolean arrays.
-    archive_idxs = N.where(archive)[0]
-    arch_grid_fit = grid_fit[archive_idxs]
-    arch_grid_fit.flags.writeable = False # For fast use of set objects
-    arch_fit = fitness[archive_idxs]
-    
-    # We look for opportunities to reject the contender, along the way removing 
-    # any dominated member of the archive:
-    for vertex in map(N.frombuffer, set(row.data for row in arch_grid_fit)):
-        high = (grid_cont > vertex).any()
-        low = (grid_cont < vertex).any()
-        if not(high or low):
-            # This hypercube may have non-dominated members.
-            in_grid = N.where((arch_grid_fit == vertex).all(axis=1))[0]
+    # The members' indices in the population stand in for their genes.
+    members = N.nonzero(archive)[0]
+    arch_viol = 0. if violation is None or len(members) == 0 else \
+        violation[members].max()
+    arch = EpsArchive(members[:,None], fitness[members], grid_fit[members],
+        violation=arch_viol)
+    accepted = arch.accept(N.r_[-1], contend_fit, grid_cont, contend_viol)
+    
+    archive[:] = False
+    members = arch.genes[:,0]
+    archive[members[members >= 0]] = True
+    return accepted
+        
+def _breed(creature, population, fitness, archive, num_pairs, stats=None, 
+    rng=None, violation=None):
+    """Select num_pairs pairs of parents - one from the population and one from 
+    the archive - and breed them. archive is an EpsArchive. Phases are timed if
+    a RunStats is given. Random numbers are drawn from rng. violation is the
+    population's constraint violation, if constrained.
+    
+    Returns:
+    offsprings - a 2*num_pairs by c array of offspring genes, each two 
+        consecutive rows being the offspring of one pair.
+    """
+    mamas = N.empty(num_pairs, dtype=int)
+    papas = N.empty(num_pairs, dtype=int)
+    for pair in range(num_pairs):
+        mamas[pair] = pop_select(fitness, None, rng, violation)
+        papas[pair] = archive.select(rng)
+    if stats is not None:
+        stats.tick('select')
+    
+    offsprings = creature.breed_many(population[mamas], archive.genes[papas],
+        rng)
+    if stats is not None:
+        stats.tick('breed')
+    return offsprings
+
+def _accept(population, fitness, archive, offspring, contend_fit, grid, 
+    changed=None, stats=None, dominance=None, history=None, iteration=0, 
+    flags=0, rng=None, violation=None, contend_viol=0.):
+    """Pass one evaluated individual through the archive and population 
+    acceptance tests, updating population, fitness and the EpsArchive 
+    IN-PLACE. If a boolean vector changed is given, a replaced population slot
+    is marked in it. Phases and acceptances are recorded if a RunStats is 
+    given. If a DominanceIndex over fitness is given, the population test uses
+    it, and it is updated. If a HistoryRecorder is given, the individual is
+    recorded with the iteration that bred it, its outcome and extra flags.
+    Random choices are drawn from rng. For constrained problems, violation is
+    the population's constraint violation, also updated IN-PLACE, and 
+    contend_viol the individual's.
+    
+    Returns:
+    whether the individual was accepted to the archive.
+    """
+    # Accept the new solution to the population and archive:
+    accepted = archive.accept(offspring, contend_fit, 
+        _boxes(contend_fit, grid, contend_viol), contend_viol)
+    if stats is not None:
+        stats.tick('archive_accept')
+    if dominance is None:
+        repl = pop_accept(fitness, contend_fit, rng, violation, contend_viol)
+    else:
+        repl = dominance.accept(contend_fit, rng)
+    if history is not None:
+        history.record(offspring, contend_fit, iteration, flags | \
+            (ARCHIVED if accepted else 0) | (0 if repl is None else REPLACED))
+    if stats is not None:
+        stats.tick('pop_accept')
+        stats.count(offsprings=1, archive_accepts=accepted, 
+            pop_accepts=repl is not None)
+    
+    if repl is None:
+        return accepted
+    
+    # Prepare next iteration:
+    population[repl] = offspring
+    if dominance is None:
+        fitness[repl] = contend_fit
+    else:
+        dominance.replace(repl, contend_fit)
+    if violation is not None:
+        violation[repl] = contend_viol
+    if changed is not None:
+        changed[repl] = True
+    if stats is not None:
+        stats.tick('update')
+    return accepted
+
+def _integrate(population, fitness, archive, offsprings, offs_fit, grid, 
+    archive_stagnation, changed=None, stats=None, dominance=None, kept=None,
+    history=None, iteration=1, rng=None, violation=None, offs_viol=None):
+    """Pass evaluated offspring, as returned by _breed(), through _accept() in
+    order. If a boolean vector kept is given, only the offspring it marks were
+    evaluated (offs_fit has their rows). If offs_viol, the offsprings' 
+    constraint violation, is given, the infeasible ones are accepted with
+    infinite fitness, and violation is the population's. Other offspring not
+    kept count as rejected. iteration is that of the first pair, for the 
+    HistoryRecorder if given.
+    
+    Returns:
+    the archive stagnation counter updated for each pair of offsprings.
+    """
+    fit_rows = iter(offs_fit)
+    infeasible_fit = N.full(fitness.shape[1], N.inf)
+    for pair in range(len(offsprings) // 2):
+        for ix in range(2*pair, 2*pair + 2):
+            contend_viol = 0.
+            if offs_viol is not None and offs_viol[ix] > 0:
+                contend_viol = offs_viol[ix]
+                contend_fit = infeasible_fit
+            elif kept is not None and not kept[ix]:
+                accepted = False
+                continue
+            else:
+                contend_fit = next(fit_rows)
             
-            lower_fit = (arch_fit[in_grid] < contend_fit).any(axis=1)
-            higher_fit = (arch_fit[in_grid] > contend_fit).any(axis=1)
-            if (lower_fit & ~higher_fit).any():
-                return False
+            accepted = _accept(population, fitness, archive, offsprings[ix], 
+                contend_fit, grid, changed, stats, dominance, history, 
+                iteration + pair, 0, rng, violation, contend_viol)
+            if accepted:
+                archive_stagnation = 0
+        
+        if not accepted: # any of the offsprings
+            archive_stagnation += 1
+    
+    return archive_stagnation
+
+class _Job(object):
+    """The evaluation of a batch of offsprings, possibly running on an executor
+    and possibly partly served from an EvaluationCache. If a boolean vector
+    kept is given, only the offsprings it marks are evaluated, their fitness
+    having been predicted as predicted.
+    """
+    def __init__(self, offsprings, objectives, executor, cache, kept=None, 
+        predicted=None):
+        self.offsprings = offsprings
+        self.kept = kept
+        self.predicted = predicted
+        self.iteration = 1 # of the first pair, for the history.
+        self.violation = None # of each offspring, if constrained.
+        self.genes = offsprings if kept is None else offsprings[kept]
+        self.future = None
+        self._cache = cache
+        
+        genes = self.genes
+        if cache is not None:
+            self._lookup = cache.lookup(genes)
+            genes = genes[self._lookup[2]]
+        self.num_evaluated = len(genes)
+        
+        if len(genes) == 0:
+            self._fitness = []
+        elif executor is None:
+            self._fitness = objectives(genes)
+        else:
+            self.future = executor.submit(objectives, genes)
+    
+    def fitness(self):
+        """The fitness of the evaluated offsprings, once the evaluation is 
+        done."""
+        if self.future is not None:
+            self._fitness = self.future.result()
+        if self._cache is None:
+            return self._fitness
+        
+        keys, cached, missing = self._lookup
+        return self._cache.complete(keys, cached, missing, self._fitness)
+
+def _total_violation(values):
+    """The total constraint violation of each individual, given the values
+    returned by the constraints function."""
+    values = N.asarray(values, dtype=float)
+    return N.maximum(values, 0).reshape(len(values), -1).sum(axis=1)
+
+def _boxes(fitness, grid, violation):
+    """grid_boxes() of fitness with this constraint violation. Infeasible
+    fitness is infinite, and its box is never compared, so it is left at 0.
+    """
+    if violation > 0:
+        return N.zeros(N.shape(fitness), dtype=N.int64)
+    return grid_boxes(fitness, grid)
+
+def _evaluate_all(population, objectives, executor, num_chunks, cache):
+    """Evaluate a whole population at once, split into num_chunks calls if
+    running on an executor.
+    """
+    if cache is not None:
+        keys, cached, missing = cache.lookup(population)
+        fitness = _evaluate_all(population[missing], objectives, executor, 
+            num_chunks, None) if missing else []
+        return cache.complete(keys, cached, missing, fitness)
+    
+    if executor is None:
+        return objectives(population)
+    chunks = N.array_split(population, min(num_chunks, len(population)))
+    return N.vstack(list(executor.map(objectives, chunks)))
+
+def _save_checkpoint(checkpoint, population, fitness, changed, archive, 
+    archive_stagnation, num_gens, evaluations, pending, rng, violation=None,
+    stats=None, surrogate=None, monitor=None, stopped=False):
+    """Save everything needed to resume the run with a Checkpointer, pending
+    being a list of (iteration, offsprings) pairs bred but not yet accepted,
+    iteration being that of the first pair of the batch, rng the run's
+    RandomStream, violation the population's constraint violation if 
+    constrained, surrogate and monitor the run's KNNSurrogate and 
+    ConvergenceMonitor if any, and stopped whether the monitor stopped it.
+    """
+    if stats is not None:
+        stats.start()
+    rng_state, rng_block = rng.get_state()
+    extra = {}
+    if surrogate is not None:
+        for name, value in surrogate.get_state().items():
+            extra['surrogate_' + name] = value
+    if monitor is not None:
+        for name, value in monitor.get_state().items():
+            extra['monitor_' + name] = value
+        extra['monitor_stopped'] = stopped
+    checkpoint.save(population, fitness, changed, archive_genes=archive.genes,
+        archive_fitness=archive.fitness,
+        archive_stagnation=archive_stagnation, gens_left=num_gens,
+        evaluations=evaluations,
+        pending=N.vstack([offsprings for iteration, offsprings in pending]) \
+            if pending else population[:0],
+        pending_sizes=[len(offsprings) for iteration, offsprings in pending],
+        pending_iterations=[iteration for iteration, offsprings in pending],
+        rng_state=rng_state, rng_block=rng_block,
+        violation=N.empty(0) if violation is None else violation,
+        archive_violation=archive.violation, **extra)
+    if stats is not None:
+        stats.tick('checkpoint')
+
+def _unprefixed(state, prefix):
+    """The entries of a loaded checkpoint state whose names start with 
+    prefix, without it.
+    """
+    return dict((name[len(prefix):], value) for name, value in state.items()
+        if name.startswith(prefix))
 
-            archive[archive_idxs[in_grid]] = False
+class EpsMOEA(object):
+    """The state of an epsilon-moea run, which can be advanced a number of 
+    iterations at a time with run(), and given individuals evaluated elsewhere
+    with immigrate(). eps_moea_optimize() is a whole run of this.
+    
+    Attributes:
+    population, fitness - the population arrays, changed in place.
+    archive - the EpsArchive of the run.
+    archive_stagnation - iterations since the archive last accepted anyone.
+    gens_left - remaining iterations of the run.
+    evaluations - number of individuals evaluated by objectives.
+    violation - the population's total constraint violation (0 for feasible
+        individuals), changed in place, or None if unconstrained.
+    stopped - whether the monitor stopped the run.
+    """
+    def __init__(self, creature, pop_size, conv_gens, num_gens, objectives, 
+        grid, batch_size=1, executor=None, in_flight=None, checkpoint=None, 
+        resume_from=None, cache=None, stats=None, monitor=None, 
+        surrogate=None, history=None, rng=None, constraints=None, 
+        initial=None):
+        """
+        Arguments are as for eps_moea_optimize(). The initial population is 
+        generated and evaluated (or the checkpoint read) here, unless given:
+        
+        initial - a tuple of population and fitness arrays to start from, 
+            e.g. evaluated elsewhere. pop_size is then ignored. With 
+            constraints, the fitness of infeasible individuals is ignored.
+        
+        rng may also be a RandomStream, e.g. one that generated the initial
+        population.
+        """
+        if executor is None:
+            in_flight = 1
+        elif in_flight is None:
+            from multiprocessing import cpu_count
+            in_flight = cpu_count()
+        
+        self.creature = creature
+        self.conv_gens = conv_gens
+        self.objectives = objectives
+        self.grid = grid
+        self.batch_size = batch_size
+        self.executor = executor
+        self.in_flight = in_flight
+        self.checkpoint = checkpoint
+        self.cache = cache
+        self.stats = stats
+        self.monitor = monitor
+        self.surrogate = surrogate
+        self.history = history
+        self.constraints = constraints
+        self.rng = rng if isinstance(rng, RandomStream) else RandomStream(rng)
+        self.stopped = False
+        
+        # (iteration, offsprings) bred before a checkpoint, not yet accepted:
+        self._resumed = []
+        self._total_gens = num_gens
+        if stats is not None:
+            stats.start()
+        
+        violation = None
+        if resume_from is None:
+            self.archive_stagnation = 0
+            self.gens_left = num_gens
+            if initial is not None:
+                population, fitness = initial
+                if constraints is not None:
+                    violation = _total_violation(constraints(population))
+                    fitness = N.where(violation[:,None] > 0, N.inf, fitness)
+                self.evaluations = 0
+            else:
+                population = creature.gen_population(pop_size, self.rng)
+                if stats is not None:
+                    stats.tick('breed')
+                
+                # Initial fitness, of the feasible individuals:
+                misses = 0 if cache is None else cache.misses
+                if constraints is None:
+                    fitness = _evaluate_all(population, objectives, executor, 
+                        in_flight, cache)
+                else:
+                    violation = _total_violation(constraints(population))
+                    feasible = violation == 0
+                    fitness = N.full((len(population), len(grid)), N.inf)
+                    if feasible.any():
+                        fitness[feasible] = _evaluate_all(population[feasible],
+                            objectives, executor, in_flight, cache)
+                if cache is not None:
+                    self.evaluations = cache.misses - misses
+                elif constraints is None:
+                    self.evaluations = len(population)
+                else:
+                    self.evaluations = int(feasible.sum())
+                if stats is not None:
+                    stats.tick('evaluate')
+                    stats.count(evaluations=self.evaluations)
             
-            underdogs = higher_fit & ~lower_fit
-            if underdogs.all():
-                break
+            # Until a feasible individual is found, the archive holds the
+            # least violating one:
+            arch_viol = 0.
+            if violation is not None and (violation > 0).all():
+                front = N.zeros(len(population), dtype=bool)
+                front[N.argmin(violation)] = True
+                arch_viol = violation.min()
+            else:
+                front = pareto_front(fitness)
+            self.archive = EpsArchive(population[front], fitness[front], 
+                _boxes(fitness[front], grid, arch_viol), grid=grid, 
+                violation=arch_viol)
+            if history is not None:
+                history.record_many(population, fitness, 0, 
+                    N.where(front, ARCHIVED | REPLACED, REPLACED))
+            if stats is not None:
+                stats.tick('archive_accept')
+                stats.batch_done(0, len(self.archive))
+        else:
+            state = load_checkpoint(resume_from)
+            population = state['population']
+            fitness = state['fitness']
+            arch_fit = state['archive_fitness']
+            arch_viol = float(state.get('archive_violation', 0.))
+            self.archive = EpsArchive(state['archive_genes'], arch_fit, 
+                _boxes(arch_fit, grid, arch_viol), grid=grid, 
+                violation=arch_viol)
+            if constraints is not None:
+                violation = state['violation']
+            self.archive_stagnation = int(state['archive_stagnation'])
+            self.gens_left = int(state['gens_left'])
+            self.evaluations = int(state['evaluations'])
+            if len(state['pending_sizes']):
+                self._resumed = list(zip(
+                    state['pending_iterations'].astype(int).tolist(), 
+                    N.split(state['pending'], 
+                        N.cumsum(state['pending_sizes'])[:-1].astype(int))))
+            self.rng.set_state(str(state['rng_state']), state['rng_block'])
+            if monitor is not None and 'monitor_history' in state:
+                monitor.set_state(_unprefixed(state, 'monitor_'))
+                self.stopped = bool(state['monitor_stopped'])
+        
+        self.population = population
+        self.fitness = fitness
+        self.violation = violation
+        if surrogate is not None and resume_from is not None and \
+            'surrogate_genes' in state:
+            surrogate.set_state(_unprefixed(state, 'surrogate_'))
+        elif surrogate is not None:
+            feasible = slice(None) if violation is None else violation == 0
+            surrogate.learn(population[feasible], fitness[feasible])
+        self._dominance = None
+        if len(population) >= _INDEXED_POP_SIZE and constraints is None:
+            self._dominance = DominanceIndex(fitness)
+        self._changed = None
+        if checkpoint is not None:
+            self._changed = N.ones(len(population), dtype=bool)
+        self._jobs = {} # by future, those running on the executor.
+    
+    def done(self):
+        """Whether the run converged or used up its iterations."""
+        return not self._resumed and not self._jobs and (self.stopped or \
+            self.archive_stagnation >= self.conv_gens or self.gens_left <= 0)
+    
+    def _batch_done(self):
+        """Checkpoint and report the state after accepting a batch."""
+        if self.monitor is not None and \
+            self.monitor.update(self.evaluations, self.archive):
+            self.stopped = True
+        if self.checkpoint is not None and self.checkpoint.due(self.gens_left):
+            if self.history is not None:
+                self.history.flush()
+            _save_checkpoint(self.checkpoint, self.population, self.fitness, 
+                self._changed, self.archive, self.archive_stagnation, 
+                self.gens_left, self.evaluations, self._resumed + \
+                [(job.iteration, job.offsprings) for job in 
+                    self._jobs.values()], self.rng,
+                self.violation, self.stats, self.surrogate, self.monitor,
+                self.stopped)
+        if self.stats is not None:
+            self.stats.batch_done(self._total_gens - self.gens_left, 
+                len(self.archive))
+    
+    def _accept_job(self, job):
+        """Pass the offsprings of a done _Job through the acceptance tests."""
+        fitness = job.fitness()
+        if self.surrogate is not None:
+            self.surrogate.learn(job.genes, fitness, job.predicted)
+        self.archive_stagnation = _integrate(self.population, self.fitness, 
+            self.archive, job.offsprings, fitness, self.grid, 
+            self.archive_stagnation, self._changed, self.stats, 
+            self._dominance, job.kept, self.history, job.iteration, self.rng,
+            self.violation, job.violation)
+    
+    def run(self, max_gens=None):
+        """Advance the run until it converges, uses up its iterations, or 
+        after max_gens more iterations. All evaluations started are accepted 
+        before returning.
+        
+        Arguments:
+        max_gens - maximum number of iterations to do now, or None for the 
+            rest of the run.
+        """
+        for batch in self._steps(max_gens):
+            pass
+    
+    def _steps(self, max_gens=None):
+        """Same as run(), as a generator yielding after each accepted batch."""
+        stop_at = 0 if max_gens is None else max(self.gens_left - max_gens, 0)
+        stats = self.stats
+        jobs = self._jobs
+        
+        # Steady-state: a batch is bred from the population as it is, whenever 
+        # there's room for one more under evaluation. Without an executor, it
+        # is evaluated and accepted right away.
+        while True:
+            while (len(jobs) < self.in_flight) and (self._resumed or \
+                ((self.archive_stagnation < self.conv_gens) and \
+                (self.gens_left > stop_at) and not self.stopped)):
+                if stats is not None:
+                    stats.start()
+                
+                if self._resumed:
+                    iteration, offsprings = self._resumed.pop(0)
+                else:
+                    iteration = self._total_gens - self.gens_left + 1
+                    # Generate new solutions, two per pair of parents:
+                    num_pairs = min(self.batch_size, self.gens_left - stop_at)
+                    offsprings = _breed(self.creature, self.population, 
+                        self.fitness, self.archive, num_pairs, stats, self.rng,
+                        self.violation)
+                    self.gens_left -= num_pairs
+                
+                # Only feasible offspring are evaluated, and only those the
+                # surrogate expects to be accepted:
+                kept = predicted = offs_viol = None
+                if self.constraints is not None:
+                    offs_viol = _total_violation(self.constraints(offsprings))
+                    kept = offs_viol == 0
+                if self.surrogate is not None:
+                    if kept is None:
+                        kept, predicted = self.surrogate.screen(offsprings, 
+                            self.fitness, self.archive, self.grid)
+                    else:
+                        kept[kept], predicted = self.surrogate.screen(
+                            offsprings[kept], self.fitness, self.archive, 
+                            self.grid)
+                job = _Job(offsprings, self.objectives, self.executor, 
+                    self.cache, kept, predicted)
+                job.iteration = iteration
+                job.violation = offs_viol
+                self.evaluations += job.num_evaluated
+                if stats is not None:
+                    stats.tick('evaluate')
+                    stats.count(evaluations=job.num_evaluated)
+                if job.future is not None:
+                    jobs[job.future] = job
+                    continue
+                
+                self._accept_job(job)
+                self._batch_done()
+                yield
             
-            # Of the remaining solutions, the closest to the grid is taken:                
-            dist_squares = ((arch_fit[in_grid[~underdogs]] - \
-                arch_grid_fit[in_grid[~underdogs]])**2).sum(axis=1)
-            remaining = dist_squares < ((contend_fit - grid_cont)**2).sum()
+            if not jobs:
+                if self.history is not None:
+                    self.history.flush()
+                break
             
-            if remaining.any():
-                archive[archive_idxs[in_grid]] = True
-                return False
-        
-        elif high and not low:
-            # The contender is dominated. The function can end, because
-            # it's impossible that others in the archive may still be dominated.
-            return False
+            from concurrent.futures import wait, FIRST_COMPLETED
+            if stats is not None:
+                stats.start()
+            done, not_done = wait(jobs, return_when=FIRST_COMPLETED)
+            if stats is not None:
+                stats.tick('evaluate')
             
-        elif low and not high:
-            # This hypercube is dominated by the new solution, exclude all its
-            # members from the archive:
-            in_grid = N.where((arch_grid_fit == vertex).all(axis=1))[0]
-            archive[archive_idxs[in_grid]] = False
+            for future in done:
+                self._accept_job(jobs.pop(future))
+            self._batch_done()
+            yield
     
-    return True
+    def immigrate(self, genes, fitness):
+        """Pass individuals evaluated elsewhere (e.g. another run's archive 
+        members) through the archive and population acceptance tests. Doesn't 
+        count as iterations, but an individual accepted to the archive resets
+        the stagnation counter.
         
-def eps_moea_optimize(creature, pop_size, conv_gens, num_gens, objectives, grid):
+        Arguments:
+        genes - an n by c array of chromosomes.
+        fitness - their n by t fitness array. With constraints, the fitness of
+            infeasible individuals is ignored.
+        """
+        if self.stats is not None:
+            self.stats.start()
+        violation = N.zeros(len(genes))
+        if self.constraints is not None:
+            violation = _total_violation(self.constraints(genes))
+            fitness = N.where(violation[:,None] > 0, N.inf, fitness)
+        
+        for offspring, contend_fit, contend_viol in zip(genes, fitness, 
+            violation):
+            if _accept(self.population, self.fitness, self.archive, offspring,
+                contend_fit, self.grid, self._changed, self.stats, 
+                self._dominance, self.history, 
+                self._total_gens - self.gens_left, MIGRATED, self.rng, 
+                self.violation, contend_viol):
+                self.archive_stagnation = 0
+        self._batch_done()
+
+def eps_moea_optimize(creature, pop_size, conv_gens, num_gens, objectives, grid,
+    batch_size=1, executor=None, in_flight=None, checkpoint=None, 
+    resume_from=None, cache=None, stats=None, monitor=None, surrogate=None,
+    history=None, rng=None, constraints=None):
     """Run an optimization using the epsilon-moea algorithm. Assumes the
     problem is in cannonical form - all target functions are to be minimized.
     
@@ -177,54 +820,123 @@ def eps_moea_optimize(creature, pop_size, conv_gens, num_gens, objectives, grid)
     nun_gens - maximum total number of iterations, with or without convergence.
     objectives - a function that given a population array returns the fitness array.
     grid - the size of the hypercubes in the epsilon-dominance tests.
+    batch_size - number of parent pairs to breed before evaluating all their 
+        offspring in one call to objectives. Each pair still counts as one
+        iteration. The default, 1, is the classic steady-state algorithm; larger
+        batches amortize the per-call overhead of vectorized objectives, but 
+        parents are selected from a population that is up to batch_size 
+        iterations old.
+    executor - optional concurrent.futures-style executor (e.g. a 
+        ProcessPoolExecutor) to run objectives on. The initial population is 
+        evaluated in in_flight chunks, then the run becomes asynchronous: a 
+        new batch is bred and submitted whenever one completes, and results 
+        are accepted in order of completion. For a process pool, objectives 
+        must be picklable.
+    in_flight - number of batches kept under evaluation in the executor. 
+        Defaults to the number of CPUs. Ignored without an executor.
+    checkpoint - a Checkpointer, to periodically save the state of the run.
+    resume_from - a checkpoint directory written by a Checkpointer. The run
+        continues from the saved state instead of a new population, including
+        the remaining iterations, archive stagnation, the state of rng, of 
+        surrogate and of monitor, so that a serial run continues exactly as 
+        it would have without interruption.
+        The other arguments should be the same as for the interrupted run.
+    cache - an EvaluationCache. Offspring whose chromosome is in it are not
+        sent to objectives.
+    stats - a RunStats, to gather the time spent in each phase of the run and
+        acceptance counts, and stream them per batch to its sink. With an 
+        executor, the evaluate phase is the time spent waiting for results.
+    monitor - a ConvergenceMonitor (or any object with its update() method),
+        given the number of evaluations and the archive after every batch. 
+        The run stops when it returns True.
+    surrogate - a KNNSurrogate, to predict the fitness of offspring and only
+        evaluate those that may be accepted to the archive or population. The
+        others count as rejected.
+    history - a HistoryRecorder, to record every individual passed through
+        the acceptance tests (the initial population, then each evaluated 
+        offspring) with the iteration that bred it and whether the archive 
+        and population accepted it. It is flushed when the run ends and 
+        before every checkpoint save.
+    rng - the numpy Generator that all the run's random choices are drawn 
+        from (a block of numbers at a time). If None, one is seeded from the
+        global numpy random state, so numpy.random.seed() also reproduces a 
+        run. Give independent runs independent generators, e.g. spawned from
+        one numpy.random.SeedSequence.
+    constraints - a function that given a population array returns an n by k
+        array of constraint values, each satisfied when <= 0. An individual's
+        violation is the sum of its positive values. Infeasible individuals 
+        are not sent to objectives; they get infinite fitness and compete by 
+        violation alone (Deb's constraint-domination: feasible beats 
+        infeasible, and the less violating of two infeasible wins). Until a
+        feasible individual is found, the archive holds the least violating 
+        one.
     
     Returns:
     population - the population array after the latest iteration.
     fitness - the fitness array after the latest iteration.
-    archive - the final archive.
-    """
-    population = creature.gen_population(pop_size)
-    archive_stagnation = 0
-
-    # Initial fitness:
-    fitness = objectives(population)
-    archive = pareto_front(fitness)
-    grid_fit = fitness - N.fmod(fitness, grid)
-
-    while (archive_stagnation < conv_gens) and (num_gens > 0):
-        # Generate new solution:
-        mama = pop_select(fitness, archive);
-        papa = archive_select(archive);
-        offsprings = creature.breed(population[mama], population[papa])
-        for offspring in offsprings:
-            contend_fit = objectives(offspring)
-            grid_cont = contend_fit - N.fmod(contend_fit, grid)
-        
-            # Accept the new solution to the population and archive:
-            accepted = archive_accept(archive, fitness, grid_fit, contend_fit, grid_cont)
-            repl = pop_accept(fitness, contend_fit)
-            
-            if accepted:
-                archive_stagnation = 0
-            if repl is None:
-                continue
-            
-            # Prepare next iteration:
-            population[repl] = offspring
-            fitness[repl] = contend_fit
-            archive[repl] = accepted
-            grid_fit[repl] = grid_cont
-        
-        if not accepted: # any of the offsprings
-            archive_stagnation += 1
-        num_gens -= 1
+    archive - the final EpsArchive. Its genes and fitness attributes hold
+        the epsilon-nondominated solutions found, including ones no longer in 
+        the population.
+    """
+    run = EpsMOEA(creature, pop_size, conv_gens, num_gens, objectives, grid,
+        batch_size, executor, in_flight, checkpoint, resume_from, cache, stats,
+        monitor, surrogate, history, rng, constraints)
+    run.run()
+    return run.population, run.fitness, run.archive
+
+# Events yielded by iter_eps_moea():
+ArchiveEvent = namedtuple('ArchiveEvent', 'inserted genes fitness')
+GenerationSummary = namedtuple('GenerationSummary', 
+    'iteration archive_size archive_stagnation')
+
+def iter_eps_moea(creature, pop_size, conv_gens, num_gens, objectives, grid,
+    **kwds):
+    """Run eps_moea_optimize() as a generator of events, so that the archive
+    can be followed while the run goes on. Closing the generator (e.g. 
+    breaking out of a loop over it) stops the run, and flushes its history.
+    
+    First an insertion is yielded for each member of the initial archive, 
+    then a summary. After every batch, the archive changes it made are 
+    yielded in order, followed by a summary.
+    
+    Arguments:
+    creature, pop_size, conv_gens, num_gens, objectives, grid - as for 
+        eps_moea_optimize().
+    kwds - other keyword arguments of eps_moea_optimize().
     
-    return population, fitness, archive
+    Yields:
+    ArchiveEvent(inserted, genes, fitness) - a member was added to the 
+        archive (inserted is True) or removed from it. genes and fitness are 
+        copies of the member's arrays.
+    GenerationSummary(iteration, archive_size, archive_stagnation) - the
+        number of iterations done, the archive size and the number of 
+        iterations since it last accepted anyone.
+    """
+    run = EpsMOEA(creature, pop_size, conv_gens, num_gens, objectives, grid,
+        **kwds)
+    try:
+        for genes, fit in zip(run.archive.genes, run.archive.fitness):
+            yield ArchiveEvent(True, genes.copy(), fit.copy())
+        journal = run.archive.journal = []
+        yield GenerationSummary(num_gens - run.gens_left, len(run.archive), 
+            run.archive_stagnation)
+        
+        for batch in run._steps():
+            for event in journal:
+                yield ArchiveEvent(*event)
+            del journal[:]
+            yield GenerationSummary(num_gens - run.gens_left, 
+                len(run.archive), run.archive_stagnation)
+    finally:
+        for future in run._jobs:
+            future.cancel()
+        if run.history is not None:
+            run.history.flush()
 
 if __name__ == "__main__":
     # A little test, with the first test function.
-    import test_functions
-    from creature import Creature
+    from . import test_functions
+    from .creature import Creature
     
     # Select which test to run from the commandline, default TZD1
     import sys
@@ -236,16 +948,18 @@ if __name__ == "__main__":
             pass # Keep the default
     
     import time
+    from .stats import RunStats
     t = time.time()
     grid = N.r_[0.0075, 0.0075]
     cr = Creature(N.zeros(30), N.ones(30), 0.033)
+    stats = RunStats()
     population, fitness, archive = eps_moea_optimize(cr, 100, 600, 20000, \
-        testfun, grid)
-    print time.time() - t
+        testfun, grid, stats=stats)
+    print(time.time() - t)
+    print(stats.summary())
     
     import pylab as P
-    archive = N.where(archive)[0]
-    P.plot(fitness[archive,0], fitness[archive,1], 'o')
+    P.plot(archive.fitness[:,0], archive.fitness[:,1], 'o')
     P.title('Archive fitness')
     
     P.figure()
@@ -0,0 +1,163 @@
+# A record of every individual that went through the acceptance tests of a
+# run, kept on disk for analysis after the run.
+#
+# The history is a directory of raw binary files, one per field, each holding
+# a row per individual. The files are memory-mapped and grown a chunk of rows
+# at a time, so recording an individual is a few stores into mapped memory.
+# The number of valid rows and the row layout are in a small .npz file next
+# to them, rewritten (atomically) only when the history is flushed, so a run
+# interrupted between flushes leaves the history as of the last flush.
+
+import os
+from collections import namedtuple
+import numpy as N
+
+_replace = getattr(os, 'replace', os.rename)
+
+# Outcome flags of a recorded individual:
+ARCHIVED = 1 # accepted to the archive.
+REPLACED = 2 # accepted to the population.
+MIGRATED = 4 # given to EpsMOEA.immigrate() rather than bred by the run.
+
+History = namedtuple('History', 'genes fitness iteration outcome')
+
+def _fields(num_genes, num_targets, genes_dtype):
+    """Name, row shape and type of each field's file."""
+    return (('genes', (num_genes,), genes_dtype),
+        ('fitness', (num_targets,), N.dtype(float)),
+        ('iteration', (), N.dtype(N.int64)),
+        ('outcome', (), N.dtype(N.int8)))
+
+def _read_layout(path):
+    with N.load(os.path.join(path, 'layout.npz')) as layout:
+        return int(layout['size']), int(layout['num_genes']), \
+            int(layout['num_targets']), N.dtype(str(layout['genes_dtype']))
+
+class HistoryRecorder(object):
+    def __init__(self, path, chunk=65536):
+        """
+        Arguments:
+        path - the history directory. A history already there (e.g. of a run
+            resumed from a checkpoint) is appended to.
+        chunk - number of rows the files grow by when full.
+        """
+        self._path = path
+        self._chunk = chunk
+        self._size = 0
+        self._capacity = 0
+        self._maps = None
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        if os.path.exists(os.path.join(path, 'layout.npz')):
+            size, num_genes, num_targets, genes_dtype = _read_layout(path)
+            self._size = size
+            self._open(num_genes, num_targets, genes_dtype)
+
+    def __len__(self):
+        return self._size
+
+    def _open(self, num_genes, num_targets, genes_dtype, more=1):
+        """Map the files with room for at least more rows, in whole chunks."""
+        self._layout = (num_genes, num_targets, genes_dtype)
+        chunks = (self._size + more - 1)//self._chunk + 1
+        self._capacity = chunks*self._chunk
+        self._maps = []
+        for name, row_shape, dtype in _fields(*self._layout):
+            filename = os.path.join(self._path, name + '.dat')
+            with open(filename, 'ab') as raw:
+                raw.truncate(self._capacity*dtype.itemsize*\
+                    int(N.prod(row_shape)))
+            self._maps.append(N.memmap(filename, dtype, 'r+',
+                shape=(self._capacity,) + row_shape))
+
+    def _grow(self, more=1):
+        for mapped in self._maps:
+            mapped.flush()
+        self._maps = None # unmap before resizing.
+        self._open(*self._layout, more=more)
+
+    def record(self, genes, fitness, iteration, outcome):
+        """Add one individual to the history.
+
+        Arguments:
+        genes - its chromosome.
+        fitness - its fitness vector.
+        iteration - the iteration (pair of parents) that bred it, 0 for the
+            initial population.
+        outcome - a combination of the ARCHIVED, REPLACED and MIGRATED flags.
+        """
+        if self._maps is None:
+            genes = N.asarray(genes)
+            self._open(len(genes), len(fitness), genes.dtype)
+        elif self._size == self._capacity:
+            self._grow()
+
+        row = self._size
+        maps = self._maps
+        maps[0][row] = genes
+        maps[1][row] = fitness
+        maps[2][row] = iteration
+        maps[3][row] = outcome
+        self._size = row + 1
+
+    def record_many(self, genes, fitness, iteration, outcome):
+        """Add n individuals to the history. Arguments as for record(), with
+        genes and fitness being n-row arrays, and iteration and outcome
+        scalars or length n vectors.
+        """
+        if len(genes) == 0:
+            return
+        if self._maps is None:
+            self._open(genes.shape[1], fitness.shape[1], genes.dtype, 
+                len(genes))
+        elif self._size + len(genes) > self._capacity:
+            self._grow(len(genes))
+
+        rows = slice(self._size, self._size + len(genes))
+        for mapped, values in zip(self._maps,
+            (genes, fitness, iteration, outcome)):
+            mapped[rows] = values
+        self._size += len(genes)
+
+    def flush(self):
+        """Write the recorded rows to disk and make them visible to
+        read_history().
+        """
+        if self._maps is None:
+            return
+        for mapped in self._maps:
+            mapped.flush()
+
+        num_genes, num_targets, genes_dtype = self._layout
+        layout = os.path.join(self._path, 'layout.npz')
+        N.savez(layout + '.tmp.npz', size=self._size, num_genes=num_genes,
+            num_targets=num_targets, genes_dtype=genes_dtype.str)
+        _replace(layout + '.tmp.npz', layout)
+
+    def close(self):
+        """Flush and unmap the files."""
+        self.flush()
+        self._maps = None
+
+def read_history(path):
+    """Map the history written by a HistoryRecorder, as of its last flush.
+    Nothing is read until used, and slices of the arrays are views of the
+    files, so a long history can be analysed a piece at a time.
+
+    Arguments:
+    path - the history directory.
+
+    Returns:
+    a History, whose fields are read-only arrays with a row per individual:
+    genes (n by c), fitness (n by t), iteration and outcome (length n).
+    """
+    size, num_genes, num_targets, genes_dtype = _read_layout(path)
+    arrays = []
+    for name, row_shape, dtype in _fields(num_genes, num_targets, genes_dtype):
+        if size == 0:
+            arrays.append(N.empty((0,) + row_shape, dtype))
+            continue
+        arrays.append(N.memmap(os.path.join(path, name + '.dat'), dtype, 'r',
+            shape=(size,) + row_shape))
+    return History(*arrays)
@@ -0,0 +1,256 @@
+# Quality indicators of a pareto-front approximation, and a stopping rule
+# based on their progress.
+#
+# The hypervolume is the volume of the objective space dominated by a set of
+# points and bounded by a reference point. It is computed exactly for up to
+# three objectives, by sweeping the points in order of the last objective
+# while keeping the two-dimensional front of the points swept so far, and
+# estimated by Monte Carlo sampling above that. The additive epsilon
+# indicator is the smallest amount by which one set must be shifted (in every
+# objective) to weakly dominate another.
+
+from bisect import bisect_left, bisect_right
+import json
+import numpy as N
+
+def _hypervolume_2d(fitness, reference):
+    order = N.lexsort(fitness.T[::-1])
+    xs = fitness[order, 0]
+    ys = N.minimum.accumulate(fitness[order, 1])
+    widths = N.diff(N.r_[xs, reference[0]])
+    return (widths*(reference[1] - ys)).sum()
+
+def _hypervolume_3d(fitness, reference):
+    fitness = fitness[N.argsort(fitness[:,2], kind='mergesort')]
+    ref_x, ref_y = reference[:2]
+    xs = [] # the two-dimensional front so far, by ascending x,
+    ys = [] # so descending y.
+    area = 0.
+    volume = 0.
+
+    for point, next_z in zip(fitness, N.r_[fitness[1:,2], reference[2]]):
+        x, y = point[:2]
+        pos = bisect_right(xs, x) - 1
+        if pos < 0 or ys[pos] > y:
+            # Add the area dominated by the point and not by the front. Going
+            # right from x, the front is at the height of the last point
+            # before x, then of each point the new one dominates:
+            start = bisect_left(xs, x)
+            end = start
+            while end < len(xs) and ys[end] >= y:
+                end += 1
+
+            height = ys[start - 1] if start > 0 else ref_y
+            edges = xs[start:end] + [xs[end] if end < len(xs) else ref_x]
+            left = x
+            for edge, step_height in zip(edges, [height] + ys[start:end]):
+                area += (edge - left)*(step_height - y)
+                left = edge
+
+            xs[start:end] = [x]
+            ys[start:end] = [y]
+
+        volume += area*(next_z - point[2])
+
+    return volume
+
+def hypervolume(fitness, reference, samples=None, rng=None):
+    """The hypervolume of a set of points (for minimized objectives).
+
+    Arguments:
+    fitness - an n by t array of points, e.g. an archive's fitness. Points
+        not below the reference point in all objectives add nothing.
+    reference - a length t vector, the reference point bounding the volume.
+    samples - for more than three objectives, either the number of random
+        points to estimate the volume by (default 100000), or an s by t array
+        of points sampled uniformly in a box whose upper corner is the
+        reference point. A fixed sample keeps the estimates of different
+        sets comparable.
+    rng - a numpy Generator for drawing samples, by default the global numpy
+        random state.
+
+    Returns:
+    the hypervolume, exact for up to three objectives.
+    """
+    reference = N.asarray(reference, dtype=float)
+    fitness = fitness[(fitness < reference).all(axis=1)]
+    if len(fitness) == 0:
+        return 0.
+
+    num_targets = len(reference)
+    if num_targets == 1:
+        return reference[0] - fitness.min()
+    if num_targets == 2:
+        return _hypervolume_2d(fitness, reference)
+    if num_targets == 3:
+        return _hypervolume_3d(fitness, reference)
+
+    if samples is None or N.isscalar(samples):
+        lower = fitness.min(axis=0)
+        rng = N.random if rng is None else rng
+        samples = lower + (reference - lower)*rng.random(
+            (samples or 100000, num_targets))
+    else:
+        lower = samples.min(axis=0)
+
+    dominated = N.zeros(len(samples), dtype=bool)
+    for point in fitness:
+        dominated |= (point <= samples).all(axis=1)
+    return dominated.mean()*N.prod(reference - lower)
+
+def additive_epsilon(approximation, target):
+    """The additive epsilon indicator: the smallest eps such that every point
+    of the target set is weakly dominated by some point of the approximation
+    set shifted by -eps. Zero or less means the approximation already covers
+    the target.
+
+    Arguments:
+    approximation - an n by t array of points.
+    target - an m by t array of points.
+    """
+    shifts = N.empty(len(target))
+    for ix, point in enumerate(target):
+        shifts[ix] = (approximation - point).max(axis=1).min()
+    return shifts.max()
+
+class ConvergenceMonitor(object):
+    def __init__(self, reference, min_gain, window, check_every=None,
+        min_epsilon=None, samples=100000, ideal=None, rng=None):
+        """
+        A stopping rule for a run: stop when the archive's hypervolume grew by
+        less than min_gain over the last window evaluations. Given to
+        eps_moea_optimize() as monitor, it is updated after every batch, and
+        computes the indicators every check_every evaluations.
+
+        Arguments:
+        reference - a length t vector, the hypervolume's reference point.
+            Should be worse in every objective than the front of interest.
+        min_gain - the smallest hypervolume gain over a window that lets the
+            run continue.
+        window - number of evaluations the gain is measured over.
+        check_every - number of evaluations between checks. Defaults to a
+            tenth of the window.
+        min_epsilon - if given, also continue while the additive epsilon
+            progress over the window (how much the archive of a window ago
+            falls short of covering the current one) is at least this.
+        samples - for more than three objectives, the number of random points
+            in the Monte Carlo hypervolume estimate. They are drawn at the
+            first check, in the box from ideal (or the archive's minimum) to
+            reference. Whenever the archive's minimum falls below the box, 
+            they are drawn again in a box enlarged beyond it, and the volumes
+            in history are recomputed with them, so that no progress is lost.
+        ideal - optional length t vector, a lower bound on the objectives.
+        rng - the numpy Generator to draw samples from. By default the 
+            monitor has one of its own, seeded with 0, so that monitors 
+            neither change a run nor each other.
+        """
+        self.reference = N.asarray(reference, dtype=float)
+        self.min_gain = min_gain
+        self.window = window
+        self.check_every = check_every or max(window // 10, 1)
+        self.min_epsilon = min_epsilon
+        self._num_samples = samples
+        self._samples = None
+        self._samples_state = None # of rng when the samples were drawn.
+        self._lower = None
+        self.ideal = None if ideal is None else N.asarray(ideal, dtype=float)
+        self._rng = N.random.default_rng(0) if rng is None else rng
+
+        self.history = [] # (evaluations, hypervolume) of every check.
+        self._fronts = [] # archive fitness at every check, for epsilon.
+        self._next_check = 0
+
+    def _draw_samples(self, lowest):
+        """Draw the Monte Carlo samples in a box below which the archive, of 
+        minimum lowest, is not, and rebase the history on them.
+        """
+        lower = lowest if self.ideal is None else N.minimum(self.ideal, lowest)
+        if self._lower is not None:
+            # Leave room for more progress, so as not to redraw every check:
+            lower = N.minimum(self._lower, 
+                lower - 0.1*(self.reference - lower))
+        self._lower = lower
+        self._samples_state = json.dumps(self._rng.bit_generator.state)
+        self._samples = lower + (self.reference - lower)*\
+            self._rng.random((self._num_samples, len(lower)))
+        self.history = [(evals, hypervolume(front, self.reference, 
+            self._samples)) for (evals, volume), front in \
+            zip(self.history, self._fronts)]
+
+    def get_state(self):
+        """The monitor's history and the state of its rng, as a dict of 
+        arrays (e.g. for a checkpoint) that set_state() restores. The Monte
+        Carlo samples are not saved, but redrawn from the rng state they 
+        were first drawn from.
+        """
+        fronts = self._fronts
+        return dict(
+            history=N.array(self.history, dtype=float).reshape(-1, 2),
+            fronts=N.vstack(fronts) if fronts else \
+                N.empty((0, len(self.reference))),
+            front_sizes=[len(front) for front in fronts],
+            next_check=self._next_check,
+            lower=N.empty(0) if self._lower is None else self._lower,
+            samples_state=self._samples_state or '',
+            rng_state=json.dumps(self._rng.bit_generator.state))
+
+    def set_state(self, state):
+        """Continue from a state returned by get_state(), replacing the 
+        monitor's history. rng must use the same kind of bit generator as 
+        the one saved.
+        """
+        self.history = [(int(evals), float(volume)) 
+            for evals, volume in state['history']]
+        sizes = N.asarray(state['front_sizes'], dtype=int)
+        self._fronts = N.split(N.array(state['fronts'], dtype=float), 
+            N.cumsum(sizes)[:-1]) if len(sizes) else []
+        self._next_check = int(state['next_check'])
+
+        self._lower = self._samples = self._samples_state = None
+        if len(state['lower']):
+            self._lower = N.array(state['lower'], dtype=float)
+            self._samples_state = str(state['samples_state'])
+            self._rng.bit_generator.state = json.loads(self._samples_state)
+            self._samples = self._lower + (self.reference - self._lower)*\
+                self._rng.random((self._num_samples, len(self._lower)))
+        self._rng.bit_generator.state = json.loads(str(state['rng_state']))
+
+    def update(self, evaluations, archive):
+        """Record the state of a run, checking the indicators if due.
+
+        Arguments:
+        evaluations - the number of evaluations done in the run so far.
+        archive - the run's EpsArchive.
+
+        Returns:
+        True if the run should stop.
+        """
+        if evaluations < self._next_check:
+            return False
+        self._next_check = evaluations + self.check_every
+
+        if len(self.reference) > 3:
+            lowest = archive.fitness.min(axis=0)
+            if self._samples is None or (lowest < self._lower).any():
+                self._draw_samples(lowest)
+        self.history.append((evaluations, hypervolume(archive.fitness,
+            self.reference, self._samples)))
+        self._fronts.append(archive.fitness.copy())
+
+        # The latest check at least a window ago:
+        past = None
+        for ix, (past_evals, past_volume) in enumerate(self.history):
+            if evaluations - past_evals < self.window:
+                break
+            past = ix
+        if past is None:
+            return False
+        del self.history[:past]
+        del self._fronts[:past]
+
+        if self.history[-1][1] - self.history[0][1] >= self.min_gain:
+            return False
+        if self.min_epsilon is not None and additive_epsilon(self._fronts[0],
+            self._fronts[-1]) >= self.min_epsilon:
+            return False
+        return True
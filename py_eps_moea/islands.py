@@ -0,0 +1,190 @@
+# The island model: several independent epsilon-moea runs in separate
+# processes, which every few iterations send some of their archive members to
+# the next island on a ring.
+#
+# Migrants go through shared memory rather than being pickled. Each island
+# owns two buffers and writes to one of them by the parity of the epoch (the
+# number of exchanges so far), so that after everyone passes the barrier of an
+# epoch, an island can read its neighbour's buffer while the neighbour is
+# already writing the next epoch's migrants into the other one. The same goes
+# for the flags by which islands tell each other they are done.
+
+import multiprocessing as mp
+from threading import BrokenBarrierError
+from queue import Empty
+import numpy as N
+
+from .eps_moea import EpsMOEA
+from .archive import EpsArchive, grid_boxes
+
+# Seconds between checks that the islands are alive, while waiting for their
+# results:
+_POLL_SECS = 1.
+
+def merge_archives(genes, fitness, grid):
+    """Merge the archives of several runs into one, by offering every member
+    to an epsilon-dominance archive, in order.
+
+    Arguments:
+    genes - a list of archive chromosome arrays, one per run.
+    fitness - a matching list of archive fitness arrays.
+    grid - the size of the hypercubes in the epsilon-dominance tests.
+
+    Returns:
+    the merged EpsArchive. Members of infinite fitness (the infeasible 
+    individuals held by constrained runs) are left out.
+    """
+    genes = N.vstack(genes)
+    fitness = N.vstack(fitness)
+    finite = N.isfinite(fitness).all(axis=1)
+    genes, fitness = genes[finite], fitness[finite]
+    boxes = grid_boxes(fitness, grid)
+
+    archive = EpsArchive(genes[:0], fitness[:0], boxes[:0], len(genes), grid)
+    for member in range(len(genes)):
+        archive.accept(genes[member], fitness[member], boxes[member])
+    return archive
+
+def _island(index, seed, run_args, run_kwds, migration_gens, num_migrants,
+    buffers, counts, done_flags, barrier, results):
+    """The main function of an island's process. Puts the island's final
+    archive on the results queue, or the error that stopped it, after breaking
+    the barrier so that the other islands stop too.
+    """
+    try:
+        _migrate(index, seed, run_args, run_kwds, migration_gens, 
+            num_migrants, buffers, counts, done_flags, barrier, results)
+    except BrokenBarrierError:
+        results.put((index, None, None, None)) # another island failed.
+    except Exception as error:
+        barrier.abort()
+        results.put((index, None, None, repr(error)))
+
+def _migrate(index, seed, run_args, run_kwds, migration_gens, num_migrants,
+    buffers, counts, done_flags, barrier, results):
+    """Run an island, exchanging migrants every migration_gens iterations
+    until all islands are done."""
+    num_islands = len(buffers)
+    run = EpsMOEA(*run_args, rng=N.random.default_rng(seed), **run_kwds)
+    num_genes = run.population.shape[1]
+
+    def buffer_view(island, parity):
+        return N.frombuffer(buffers[island], dtype=N.float64).reshape(
+            2, num_migrants, -1)[parity]
+
+    epoch = 0
+    while True:
+        run.run(migration_gens)
+
+        # Publish a random sample of the archive:
+        parity = epoch % 2
+        migrants = run.rng.generator.permutation(
+            len(run.archive))[:num_migrants]
+        outbox = buffer_view(index, parity)
+        outbox[:len(migrants), :num_genes] = run.archive.genes[migrants]
+        outbox[:len(migrants), num_genes:] = run.archive.fitness[migrants]
+        counts[2*index + parity] = len(migrants)
+        done_flags[2*index + parity] = run.done()
+
+        barrier.wait()
+        if all(done_flags[2*island + parity] for island in range(num_islands)):
+            break
+
+        source = (index - 1) % num_islands
+        inbox = buffer_view(source, parity)[:counts[2*source + parity]]
+        run.immigrate(inbox[:, :num_genes].copy(), inbox[:, num_genes:].copy())
+        epoch += 1
+
+    results.put((index, run.archive.genes, run.archive.fitness, None))
+
+def island_optimize(creature, pop_size, conv_gens, num_gens, objectives, grid,
+    num_islands=None, migration_gens=100, num_migrants=10, seed=None,
+    **kwds):
+    """Run eps_moea_optimize() on several islands in parallel processes,
+    migrating archive members between them, and merge the final archives.
+
+    Arguments:
+    creature, pop_size, conv_gens, num_gens, objectives, grid - as for
+        eps_moea_optimize(), per island. An island that converges waits for
+        the others, and resumes if migrants get into its archive.
+    num_islands - number of islands (processes). Defaults to the number of
+        CPUs.
+    migration_gens - number of iterations each island does between
+        migrations.
+    num_migrants - number of archive members, picked randomly, that each
+        island sends to the next one on a ring at every migration.
+    seed - seed of a numpy.random.SeedSequence, from which each island's 
+        random generator is spawned, so their streams are independent. If 
+        None, it is drawn from rng if given (a numpy Generator or a 
+        RandomStream), or else from the global random state.
+    kwds - other keyword arguments of eps_moea_optimize(), given to each
+        island. They must be picklable where processes are spawned rather than
+        forked; an executor or a Checkpointer can't be shared by islands. An
+        rng is not given to the islands, which use their own generators.
+
+    Returns:
+    the merged EpsArchive of all islands.
+    
+    Raises RuntimeError if an island fails, or its process dies.
+    """
+    if num_islands is None:
+        num_islands = mp.cpu_count()
+    rng = kwds.pop('rng', None)
+    if seed is None and rng is not None:
+        seed = getattr(rng, 'generator', rng).integers(0, 2**32, size=4, 
+            dtype=N.uint32)
+    elif seed is None:
+        seed = N.random.randint(0, 2**32, size=4, dtype=N.uint32)
+    seeds = N.random.SeedSequence(seed).spawn(num_islands)
+
+    record_len = creature.chromosome_len() + len(grid)
+    buffers = [mp.RawArray('d', 2*num_migrants*record_len) \
+        for island in range(num_islands)]
+    counts = mp.RawArray('i', 2*num_islands)
+    done_flags = mp.RawArray('b', 2*num_islands)
+    barrier = mp.Barrier(num_islands)
+    results = mp.Queue()
+
+    run_args = (creature, pop_size, conv_gens, num_gens, objectives, grid)
+    islands = [mp.Process(target=_island, args=(index, seeds[index], run_args,
+        kwds, migration_gens, num_migrants, buffers, counts, done_flags,
+        barrier, results)) for index in range(num_islands)]
+    for island in islands:
+        island.start()
+
+    # Results must be taken off the queue before joining the processes. An
+    # island process that dies without a result (killed, or crashed outside
+    # Python) would leave this waiting forever, so the islands are checked
+    # while waiting:
+    archives = []
+    while len(archives) < num_islands:
+        try:
+            archives.append(results.get(timeout=_POLL_SECS))
+            continue
+        except Empty:
+            pass
+        
+        reported = set(archive[0] for archive in archives)
+        dead = [index for index, island in enumerate(islands) \
+            if island.exitcode is not None and index not in reported]
+        if not dead:
+            continue
+        try: # a result put just before exiting may still be on its way.
+            archives.append(results.get(timeout=_POLL_SECS))
+        except Empty:
+            barrier.abort()
+            for island in islands:
+                island.terminate()
+                island.join()
+            raise RuntimeError("Island %d died with exit code %d" % \
+                (dead[0], islands[dead[0]].exitcode))
+    
+    archives.sort(key=lambda archive: archive[0])
+    for island in islands:
+        island.join()
+    for index, genes, fitness, error in archives:
+        if error is not None:
+            raise RuntimeError("Island %d failed: %s" % (index, error))
+
+    return merge_archives([archive[1] for archive in archives],
+        [archive[2] for archive in archives], grid)
@@ -0,0 +1,97 @@
+# Timing and counting of what an optimization run spends its time on.
+#
+# The run is divided into phases, and each phase is timed by the clock reading
+# at its end (see RunStats.tick()), so that instrumenting costs one clock
+# reading per phase.
+
+import time
+
+_clock = getattr(time, 'perf_counter', time.time)
+
+class RunStats(object):
+    phases = ('select', 'breed', 'evaluate', 'archive_accept', 'pop_accept',
+        'update', 'checkpoint')
+
+    def __init__(self, sink=None):
+        """
+        Arguments:
+        sink - optional callable, given a record (dict) after every batch of
+            offsprings is accepted. The record has the iteration number, the
+            batch's number of offsprings, evaluations (calls to objectives
+            per individual), archive and population acceptances, the archive
+            size after the batch, and the time spent in each phase during
+            the batch.
+        """
+        self.sink = sink
+        self.times = dict.fromkeys(self.phases, 0.)
+        self.calls = dict.fromkeys(self.phases, 0)
+        self.offsprings = 0
+        self.evaluations = 0
+        self.archive_accepts = 0
+        self.pop_accepts = 0
+
+        self._batch = dict.fromkeys(self.phases, 0.)
+        self._batch_counts = [0, 0, 0, 0]
+        self._last = _clock()
+
+    def start(self):
+        """Start timing the next phase from now."""
+        self._last = _clock()
+
+    def tick(self, phase):
+        """Attribute the time since the last tick or start to a phase."""
+        now = _clock()
+        self._batch[phase] += now - self._last
+        self.calls[phase] += 1
+        self._last = now
+
+    def count(self, offsprings=0, evaluations=0, archive_accepts=0,
+        pop_accepts=0):
+        """Add to the counters of the current batch."""
+        counts = self._batch_counts
+        counts[0] += offsprings
+        counts[1] += evaluations
+        counts[2] += archive_accepts
+        counts[3] += pop_accepts
+
+    def batch_done(self, iteration, archive_size):
+        """Close the current batch, adding it to the totals, and pass its
+        record to the sink.
+
+        Arguments:
+        iteration - number of iterations (pairs of parents) done so far.
+        archive_size - number of members in the archive.
+        """
+        offsprings, evaluations, archive_accepts, pop_accepts = \
+            self._batch_counts
+        self.offsprings += offsprings
+        self.evaluations += evaluations
+        self.archive_accepts += archive_accepts
+        self.pop_accepts += pop_accepts
+        for phase, elapsed in self._batch.items():
+            self.times[phase] += elapsed
+
+        if self.sink is not None:
+            self.sink(dict(iteration=iteration, offsprings=offsprings,
+                evaluations=evaluations, archive_accepts=archive_accepts,
+                pop_accepts=pop_accepts, archive_size=archive_size,
+                times=self._batch))
+            self._batch = dict.fromkeys(self.phases, 0.)
+        else:
+            for phase in self.phases:
+                self._batch[phase] = 0.
+        self._batch_counts = [0, 0, 0, 0]
+
+    def summary(self):
+        """A printable table of the totals."""
+        total = sum(self.times.values())
+        lines = ["%-15s %10s %8s %7s" % ('phase', 'seconds', 'calls', '%')]
+        for phase in self.phases:
+            lines.append("%-15s %10.4f %8d %7.1f" % (phase, self.times[phase],
+                self.calls[phase], 100*self.times[phase]/(total or 1.)))
+
+        offsprings = float(self.offsprings or 1)
+        lines.append("offsprings %d, evaluations %d, archive acceptance %.3f, "
+            "population acceptance %.3f" % (self.offsprings, self.evaluations,
+            self.archive_accepts/offsprings, self.pop_accepts/offsprings))
+        return '\n'.join(lines)
@@ -0,0 +1,74 @@
+# Random number streams for optimization runs.
+#
+# A run draws its random numbers from a numpy Generator of its own, so that
+# it is reproducible from a seed whatever else uses numpy.random, and so that
+# independent runs (e.g. islands) can get independent streams spawned from
+# one seed. Selection and acceptance make many single draws, each of which
+# costs a call into the Generator, so the stream draws uniform numbers a
+# block at a time and hands them out from there.
+#
+# Everything that draws takes an rng argument, which is anything with the
+# Generator's random() method: a Generator, a RandomStream, or the
+# numpy.random module itself (the global state), which is used when rng is
+# None. Integers are drawn as uniform numbers scaled and rounded down.
+
+import numpy as N
+
+def seeded_generator(seed=None):
+    """A numpy Generator. Without a seed, it is seeded from the global numpy
+    random state, so numpy.random.seed() still makes a run reproducible.
+    """
+    if seed is None:
+        seed = N.random.randint(0, 2**32, size=4, dtype=N.uint32)
+    return N.random.default_rng(seed)
+
+class RandomStream(object):
+    def __init__(self, generator=None, block=4096):
+        """
+        Arguments:
+        generator - the numpy Generator to draw from. By default one is made
+            by seeded_generator().
+        block - the number of uniform numbers drawn at a time.
+        """
+        if generator is None:
+            generator = seeded_generator()
+        self.generator = generator
+        self._block_size = block
+        self._block = N.empty(0)
+        self._pos = 0
+
+    def random(self, size=None):
+        """Uniform numbers in [0, 1), as Generator.random()."""
+        if size is None:
+            if self._pos == len(self._block):
+                self._block = self.generator.random(self._block_size)
+                self._pos = 0
+            self._pos += 1
+            return self._block[self._pos - 1]
+
+        count = int(N.prod(size))
+        if count > len(self._block) - self._pos:
+            if count >= self._block_size:
+                return self.generator.random(size)
+            self._block = self.generator.random(self._block_size)
+            self._pos = 0
+        drawn = self._block[self._pos:self._pos + count]
+        self._pos += count
+        return drawn.reshape(size)
+
+    def get_state(self):
+        """The state of the stream, as a JSON string and an array of the
+        numbers drawn but not yet handed out, e.g. for a checkpoint.
+        """
+        import json
+        return json.dumps(self.generator.bit_generator.state), \
+            self._block[self._pos:].copy()
+
+    def set_state(self, state, block):
+        """Continue the stream from a state returned by get_state(). The
+        generator must use the same kind of bit generator as the one saved.
+        """
+        import json
+        self.generator.bit_generator.state = json.loads(state)
+        self._block = N.array(block, dtype=float)
+        self._pos = 0
@@ -0,0 +1,177 @@
+# A surrogate model of the objectives, used to screen offspring before they
+# are evaluated.
+#
+# Fitness is predicted from the k nearest evaluated chromosomes, weighted by
+# inverse distance. Offspring whose prediction, made optimistic by the
+# model's error so far, would be rejected by both the archive and the
+# population are not evaluated at all. Every true evaluation is added to the
+# model, so it gets better as the run goes on.
+
+import numpy as N
+from .archive import grid_boxes, compare_boxes
+
+class KNNSurrogate(object):
+    def __init__(self, k=5, min_samples=50, max_samples=10000, margin=None,
+        scale=None):
+        """
+        Arguments:
+        k - number of neighbours a prediction is made from.
+        min_samples - no offspring is screened out before the model has this
+            many samples.
+        max_samples - the most samples kept. Beyond it, the oldest are
+            replaced.
+        margin - the amount (scalar or per objective) subtracted from
+            predictions before the acceptance tests. None uses the mean
+            absolute error of the predictions so far.
+        scale - divide genes by this (scalar or per gene) before measuring
+            distances, e.g. the ranges of the genes.
+        """
+        self.k = k
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.margin = margin
+        self.scale = scale
+
+        self.saved = 0 # offspring not sent to objectives.
+        self.screened = 0 # offspring given to screen().
+        self._error_sum = 0.
+        self._error_count = 0
+
+        self._genes = None
+        self._fit = None
+        self._size = 0
+        self._added = 0
+
+    def __len__(self):
+        return self._size
+
+    def error(self):
+        """The mean absolute prediction error per objective, over the
+        offspring that were predicted and then evaluated; None before any.
+        """
+        if self._error_count == 0:
+            return None
+        return self._error_sum/self._error_count
+
+    def learn(self, genes, fitness, predicted=None):
+        """Add evaluated chromosomes to the model.
+
+        Arguments:
+        genes - an n by c array of chromosomes.
+        fitness - their n by t fitness.
+        predicted - optional n by t fitness predicted for them before, to
+            measure the model's error.
+        """
+        if predicted is not None and len(genes):
+            self._error_sum = self._error_sum + \
+                N.abs(predicted - fitness).sum(axis=0)
+            self._error_count += len(genes)
+
+        if self._genes is None:
+            capacity = min(max(64, len(genes)), self.max_samples)
+            self._genes = N.empty((capacity, genes.shape[1]))
+            self._fit = N.empty((capacity, fitness.shape[1]))
+
+        for row in range(len(genes)):
+            if self._size < self.max_samples:
+                pos = self._size
+                if pos == len(self._genes):
+                    capacity = min(2*pos, self.max_samples)
+                    for name in ('_genes', '_fit'):
+                        old = getattr(self, name)
+                        new = N.empty((capacity, old.shape[1]))
+                        new[:pos] = old
+                        setattr(self, name, new)
+                self._size += 1
+            else:
+                pos = self._added % self.max_samples
+            self._genes[pos] = genes[row]
+            self._fit[pos] = fitness[row]
+            self._added += 1
+
+    def get_state(self):
+        """The model's samples, error sums and counters, as a dict of arrays
+        (e.g. for a checkpoint) that set_state() restores.
+        """
+        return dict(genes=self._genes[:self._size] if self._size else \
+                N.empty((0, 0)), 
+            fitness=self._fit[:self._size] if self._size else N.empty((0, 0)),
+            added=self._added, error_sum=self._error_sum, 
+            error_count=self._error_count, saved=self.saved, 
+            screened=self.screened)
+
+    def set_state(self, state):
+        """Continue from a state returned by get_state(), replacing the 
+        model's samples and counters.
+        """
+        self._size = len(state['genes'])
+        self._genes = self._fit = None
+        if self._size:
+            self._genes = N.array(state['genes'], dtype=float)
+            self._fit = N.array(state['fitness'], dtype=float)
+        self._added = int(state['added'])
+        self._error_sum = N.array(state['error_sum'], dtype=float)
+        if self._error_sum.ndim == 0:
+            self._error_sum = float(self._error_sum)
+        self._error_count = int(state['error_count'])
+        self.saved = int(state['saved'])
+        self.screened = int(state['screened'])
+
+    def predict(self, genes):
+        """Predict the fitness of an n by c array of chromosomes."""
+        samples = self._genes[:self._size]
+        if self.scale is not None:
+            genes = genes/self.scale
+            samples = samples/self.scale
+
+        dists = (genes**2).sum(axis=1)[:,None] + (samples**2).sum(axis=1) - \
+            2*N.dot(genes, samples.T)
+        N.maximum(dists, 0, out=dists)
+        k = min(self.k, self._size)
+        nearest = N.argpartition(dists, k - 1, axis=1)[:,:k]
+        weights = 1./(N.sqrt(N.take_along_axis(dists, nearest, axis=1)) + 1e-12)
+        weights /= weights.sum(axis=1)[:,None]
+        return (weights[...,None]*self._fit[nearest]).sum(axis=1)
+
+    def screen(self, offsprings, fitness, archive, grid):
+        """Decide which offspring to evaluate.
+
+        Arguments:
+        offsprings - an n by c array of offspring chromosomes.
+        fitness - the population's fitness.
+        archive - the run's EpsArchive.
+        grid - the size of the hypercubes in the epsilon-dominance tests.
+
+        Returns:
+        kept - a length n boolean vector, True for the offspring likely to be
+            accepted to the archive or population, which should be evaluated.
+        predicted - the predicted fitness of the kept offspring, or None if
+            the model is not yet trained or the archive holds no feasible
+            individual (so any feasible offspring is accepted).
+        """
+        self.screened += len(offsprings)
+        if self._size < self.min_samples or archive.violation > 0:
+            return N.ones(len(offsprings), dtype=bool), None
+
+        predicted = self.predict(offsprings)
+        margin = self.margin
+        if margin is None:
+            margin = 0. if self.error() is None else self.error()
+        hopeful = predicted - margin
+
+        kept = N.empty(len(offsprings), dtype=bool)
+        arch_boxes = archive.boxes.T
+        for ix, contend_fit in enumerate(hopeful):
+            # The population accepts whoever isn't dominated:
+            kept[ix] = not ((fitness <= contend_fit).all(axis=1) & \
+                (fitness < contend_fit).any(axis=1)).any()
+            if kept[ix]:
+                continue
+
+            # The archive rejects whoever has a member in a dominating box:
+            better, worse = compare_boxes(arch_boxes, 
+                grid_boxes(contend_fit, grid))
+            kept[ix] = not (better & ~worse).any()
+
+        self.saved += int(len(offsprings) - kept.sum())
+        return kept, predicted[kept]
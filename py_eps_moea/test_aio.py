@@ -0,0 +1,108 @@
+# Tests of the asyncio driver, against a stand-in evaluation server on a
+# local socket. Separate from test_eps_moea because of the async syntax.
+
+import unittest
+import asyncio
+import time
+import struct
+from numpy import testing
+import numpy as N
+
+from .aio import eps_moea_optimize_async
+from .eps_moea import eps_moea_optimize
+from .creature import Creature
+from .test_functions import tau1
+
+class StandInServer(object):
+    """Evaluates tau1 for chromosomes sent over a socket, a request being the
+    number of rows and columns and then the genes as float64. Requests whose
+    first gene is below slow_below are answered after a long delay, except
+    the first prompt ones (the initial population, which isn't timed).
+    """
+    def __init__(self, slow_below=-1., prompt=0):
+        self.slow_below = slow_below
+        self.prompt = prompt
+        self.requests = 0
+        self.dropped = 0
+        self._handlers = set() # tasks serving a connection.
+
+    async def serve(self, reader, writer):
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        try:
+            while True:
+                try:
+                    rows, cols = struct.unpack('ii',
+                        await reader.readexactly(8))
+                except asyncio.IncompleteReadError:
+                    return
+                genes = N.frombuffer(await reader.readexactly(rows*cols*8))
+                genes = genes.reshape(rows, cols)
+                self.requests += 1
+                if self.requests > self.prompt and \
+                    genes[0,0] < self.slow_below:
+                    self.dropped += 1
+                    await asyncio.sleep(10)
+                writer.write(tau1(genes).tobytes())
+                await writer.drain()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._handlers.discard(handler)
+            writer.close()
+
+    async def optimize(self, **kwds):
+        server = await asyncio.start_server(self.serve, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+
+        async def objectives(genes):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            try:
+                writer.write(struct.pack('ii', *genes.shape) + genes.tobytes())
+                fitness = await reader.readexactly(len(genes)*2*8)
+                return N.frombuffer(fitness).reshape(-1, 2)
+            finally:
+                writer.close()
+
+        try:
+            return await eps_moea_optimize_async(Creature(N.zeros(10),
+                N.ones(10), 0.033), 20, 500, 300, objectives, N.r_[0.05, 0.05],
+                batch_size=2, **kwds)
+        finally:
+            # From Python 3.12, wait_closed() also waits for the connections
+            # to close, so handlers still delaying a dropped request's answer
+            # are cancelled first:
+            server.close()
+            for handler in list(self._handlers):
+                handler.cancel()
+            await server.wait_closed()
+
+class TestAsyncDriver(unittest.TestCase):
+    def test_serial(self):
+        """One evaluation in flight reproduces the serial run"""
+        N.random.seed(7)
+        population, fitness, archive = asyncio.run(
+            StandInServer().optimize(in_flight=1))
+        N.random.seed(7)
+        serial = eps_moea_optimize(Creature(N.zeros(10), N.ones(10), 0.033),
+            20, 500, 300, tau1, N.r_[0.05, 0.05], batch_size=2)
+
+        testing.assert_array_equal(population, serial[0])
+        testing.assert_array_equal(fitness, serial[1])
+        testing.assert_array_equal(archive.genes, serial[2].genes)
+
+    def test_timeout(self):
+        """Evaluations that take too long are cancelled and dropped"""
+        server = StandInServer(slow_below=0.1, prompt=8)
+        N.random.seed(7)
+        start = time.time()
+        population, fitness, archive = asyncio.run(
+            server.optimize(in_flight=8, timeout=0.05))
+
+        # Much less than one delayed answer:
+        self.assertTrue(time.time() - start < 5)
+        self.assertTrue(server.dropped > 0)
+        self.assertTrue(len(archive) > 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,25 +1,111 @@
 # Test suite for the epsilon-moea algorithm implementation.
 
 import unittest
+import numpy as N
 from numpy import testing
-from numpy import array, vstack, hstack, empty, zeros, r_, c_, bool
-from eps_moea import *
+from numpy import array, vstack, hstack, empty, zeros, r_, c_
+from numpy import random, ones, inf
+from .eps_moea import *
+from .archive import grid_boxes
+from .creature import Creature
+from .test_functions import tau1
+
+def rebuild_archive_accept(archive, fitness, grid_fit, contend_fit, grid_cont):
+    """The original archive test, which rebuilds the set of occupied boxes
+    from the archive mask over the population on every call. Kept as the
+    reference for EpsArchive. Arguments as for archive_accept().
+    """
+    archive_idxs = N.where(archive)[0]
+    arch_grid_fit = grid_fit[archive_idxs]
+    arch_fit = fitness[archive_idxs]
+    
+    for vertex in map(N.array, set(map(tuple, arch_grid_fit))):
+        high = (grid_cont > vertex).any()
+        low = (grid_cont < vertex).any()
+        if not(high or low):
+            in_grid = N.where((arch_grid_fit == vertex).all(axis=1))[0]
+            
+            lower_fit = (arch_fit[in_grid] < contend_fit).any(axis=1)
+            higher_fit = (arch_fit[in_grid] > contend_fit).any(axis=1)
+            if (lower_fit & ~higher_fit).any():
+                return False
+
+            archive[archive_idxs[in_grid]] = False
+            
+            underdogs = higher_fit & ~lower_fit
+            if underdogs.all():
+                break
+            
+            dist_squares = ((arch_fit[in_grid[~underdogs]] - \
+                arch_grid_fit[in_grid[~underdogs]])**2).sum(axis=1)
+            remaining = dist_squares < ((contend_fit - grid_cont)**2).sum()
+            
+            if remaining.any():
+                archive[archive_idxs[in_grid]] = True
+                return False
+        
+        elif high and not low:
+            return False
+            
+        elif low and not high:
+            in_grid = N.where((arch_grid_fit == vertex).all(axis=1))[0]
+            archive[archive_idxs[in_grid]] = False
+    
+    return True
+
+def rebuild_archive(fitness, grid, initial=0):
+    """Feed fitness rows in order to rebuild_archive_accept(), each with a row
+    of its own so that no member is lost by being replaced. The first 
+    initial rows start the archive with their pareto front.
+    
+    Returns:
+    the members' fitness, sorted.
+    """
+    grid_fit = fitness - N.fmod(fitness, grid)
+    archive = N.zeros(len(fitness), dtype=bool)
+    archive[:initial] = pareto_front(fitness[:initial])
+    for row in range(initial, len(fitness)):
+        archive[row] = rebuild_archive_accept(archive, fitness, grid_fit, 
+            fitness[row], grid_fit[row])
+    return sorted(map(tuple, fitness[archive]))
+
+def die(genes):
+    """Objectives that end the process evaluating them, as a crash would."""
+    import os
+    os._exit(3)
 
 class TestEpsMOEA(unittest.TestCase):
+    def assert_same_run(self, first, second):
+        """Compare the results of two eps_moea_optimize() runs"""
+        for first_arr, second_arr in zip(first[:2], second[:2]):
+            testing.assert_array_equal(first_arr, second_arr)
+        testing.assert_array_equal(first[2].genes, second[2].genes)
+        testing.assert_array_equal(first[2].fitness, second[2].fitness)
+
     def test_pareto_front(self):
         """Pareto front is found correctly"""
         fit1 = empty((10, 2))
         fit1[:,0] = r_[1:11]
         fit1[:,1] = 1./fit1[:,0]
-        self.failUnless(pareto_front(fit1).all())
+        self.assertTrue(pareto_front(fit1).all())
 
         fit2 = fit1 + 0.1
         fit2[:,1] = 2./fit2[:,0]
-        self.failUnless(pareto_front(fit2).all())
+        self.assertTrue(pareto_front(fit2).all())
         
         pf = pareto_front(vstack((fit1, fit2)));
-        self.failUnless(pf[:10].all() and not pf[10:].any())
+        self.assertTrue(pf[:10].all() and not pf[10:].any())
 
+    def test_pareto_front_random(self):
+        """Fast pareto front agrees with brute force, ties included"""
+        random.seed(0)
+        for num_targets in range(1, 6):
+            # Rounding creates identical individuals and partial ties:
+            fit = (random.random_sample((300, num_targets))*5).round()
+            dominated = ((fit[:,None] <= fit).all(axis=2) & \
+                (fit[:,None] < fit).any(axis=2)).any(axis=0)
+            testing.assert_array_equal(pareto_front(fit), ~dominated)
+        
     def test_pop_accept(self):
         """Acceptence to the population is as expected"""
         fit = empty((10,2))
@@ -30,17 +116,17 @@ class TestEpsMOEA(unittest.TestCase):
         # replaced:
         contend_fit = r_[0, 0]
         repl = pop_accept(fit, contend_fit)
-        self.failIf(repl is None)
+        self.assertFalse(repl is None)
         
         # Test 2: (100,100) is dominated by all, it is thrown away.
         contend_fit = r_[100, 100]
         repl = pop_accept(fit, contend_fit)
-        self.failUnless(repl is None)
+        self.assertTrue(repl is None)
 
         # Test 3: (1.5, 0.4) dominates the second element, so it is replaced.
         contend_fit = r_[1.5, 0.4]
         repl = pop_accept(fit, contend_fit)
-        self.failUnless(repl == 1)
+        self.assertTrue(repl == 1)
         
     def test_archive_accept(self):
         """Acceptance to the archive works"""
@@ -73,10 +159,10 @@ class TestEpsMOEA(unittest.TestCase):
             eps_cont = contend_fit - N.fmod(contend_fit, grid)
             accepted = archive_accept(new_arch, fit, eps_fit, contend_fit, eps_cont)
             
-            self.failUnless(accepted)
+            self.assertTrue(accepted)
             # Since in this test the contender is not in the population,
             # the entire archive is emptied.
-            self.failIf(new_arch[1:].any())
+            self.assertFalse(new_arch[1:].any())
 
         # Test 2: (2.1, 0.51) is dominated by the archive, the archive must return 
         # unchanged.
@@ -88,7 +174,7 @@ class TestEpsMOEA(unittest.TestCase):
             eps_fit = fit - N.fmod(fit, grid)
             eps_cont = contend_fit - N.fmod(contend_fit, grid)
             accepted = archive_accept(new_arch, fit, eps_fit, contend_fit, eps_cont)
-            self.failIf(accepted);
+            self.assertFalse(accepted);
             testing.assert_array_equal(new_arch, archive)
 
         # Test 3: (1.5, 0.4) dominates the second element of the front, so it is 
@@ -102,10 +188,10 @@ class TestEpsMOEA(unittest.TestCase):
             eps_cont = contend_fit - N.fmod(contend_fit, grid)
             accepted = archive_accept(new_arch, fit, eps_fit, contend_fit, eps_cont)
             
-            self.failUnless(accepted)
+            self.assertTrue(accepted)
             # Only the place of the second item of the front (index 2 in the 
             # population) is changed.
-            self.failIf(new_arch[2])
+            self.assertFalse(new_arch[2])
             new_arch[2] = True
             testing.assert_array_equal(new_arch, archive)
 
@@ -113,5 +199,583 @@ class TestEpsMOEA(unittest.TestCase):
         eps_fit = fit - N.fmod(fit, coarse_grid)
         eps_cont = contend_fit - N.fmod(contend_fit, coarse_grid)
         accepted = archive_accept(archive, fit, eps_fit, contend_fit, eps_cont)
-        self.failUnless(accepted)
+        self.assertTrue(accepted)
         testing.assert_array_equal(archive, array(([True] + [False]*19)))
+
+    def test_persistent_archive(self):
+        """The run's archive is what the original archive test makes of all 
+        the individuals evaluated"""
+        evaluated = []
+        def objectives(genes):
+            evaluated.append(genes.copy())
+            return tau1(genes)
+        
+        cr = Creature(zeros(10), ones(10), 0.1)
+        grid = r_[0.01, 0.01]
+        random.seed(4)
+        population, fitness, archive = eps_moea_optimize(cr, 20, 10**6, 500,
+            objectives, grid)
+        
+        self.assertEqual(sorted(map(tuple, archive.fitness)), 
+            rebuild_archive(tau1(vstack(evaluated)), grid, 20))
+
+    def test_archive_many_objectives(self):
+        """EpsArchive keeps the members the original archive test keeps,
+        with many objectives"""
+        from .archive import EpsArchive
+        from .test_functions import dtlz2
+        random.seed(3)
+        for num_targets in (5, 6, 8):
+            # DTLZ2 solutions near the front:
+            genes = random.random_sample((400, 12))
+            genes[:,num_targets - 1:] = 0.5 + \
+                0.1*(genes[:,num_targets - 1:] - 0.5)
+            fitness = dtlz2(genes, num_targets)
+
+            for grid in (0.1, 0.05):
+                grid = ones(num_targets)*grid
+                boxes = grid_boxes(fitness, grid)
+                archive = EpsArchive(genes[:0], fitness[:0], boxes[:0],
+                    grid=grid)
+                for member in range(len(genes)):
+                    archive.accept(genes[member], fitness[member],
+                        boxes[member])
+
+                self.assertEqual(sorted(map(tuple, archive.fitness)),
+                    rebuild_archive(fitness, grid))
+
+    def test_executor(self):
+        """A single in-flight batch on an executor reproduces the serial run"""
+        from concurrent.futures import ThreadPoolExecutor
+        cr = Creature(zeros(10), ones(10), 0.033)
+        
+        random.seed(7)
+        serial = eps_moea_optimize(cr, 20, 50, 200, tau1, r_[0.05, 0.05])
+        random.seed(7)
+        with ThreadPoolExecutor(2) as executor:
+            pooled = eps_moea_optimize(cr, 20, 50, 200, tau1, r_[0.05, 0.05],
+                executor=executor, in_flight=1)
+        
+        self.assert_same_run(serial, pooled)
+
+    def test_batch_size_one(self):
+        """batch_size=1 is the pair by pair loop: breed, then evaluate and
+        accept each offspring in turn"""
+        from numpy.random import default_rng
+        from .archive import EpsArchive
+        from .eps_moea import _accept
+        from .streams import RandomStream
+        cr = Creature(zeros(10), ones(10), 0.1)
+        grid = r_[0.1, 0.1]
+        run = eps_moea_optimize(cr, 20, 10, 1000, tau1, grid, batch_size=1,
+            rng=default_rng(1))
+
+        rng = RandomStream(default_rng(1))
+        population = cr.gen_population(20, rng)
+        fitness = tau1(population)
+        front = pareto_front(fitness)
+        archive = EpsArchive(population[front], fitness[front],
+            grid_boxes(fitness[front], grid), grid=grid)
+        archive_stagnation = 0
+        num_gens = 1000
+        while (archive_stagnation < 10) and (num_gens > 0):
+            mama = pop_select(fitness, None, rng)
+            papa = archive.select(rng)
+            offsprings = cr.breed_many(population[[mama]],
+                archive.genes[[papa]], rng)
+            for offspring in offsprings:
+                accepted = _accept(population, fitness, archive, offspring,
+                    tau1(offspring)[0], grid, rng=rng)
+                if accepted:
+                    archive_stagnation = 0
+            if not accepted: # any of the offsprings
+                archive_stagnation += 1
+            num_gens -= 1
+
+        self.assertTrue(num_gens > 0) # converged.
+        self.assert_same_run(run, (population, fitness, archive))
+
+    def test_batch_convergence(self):
+        """A run that converges in the middle of a batch stops after it"""
+        calls = []
+        def objectives(genes):
+            # All offspring are dominated by the initial population.
+            calls.append(len(genes))
+            return zeros((len(genes), 2)) + (len(calls) > 1)
+
+        cr = Creature(zeros(10), ones(10), 0.1)
+        run = EpsMOEA(cr, 20, 10, 1000, objectives, r_[0.01, 0.01],
+            batch_size=4)
+        run.run()
+
+        # conv_gens runs out at the 10th pair, in the third batch:
+        self.assertEqual(calls, [20, 8, 8, 8])
+        self.assertEqual(run.archive_stagnation, 12)
+        self.assertEqual(run.gens_left, 1000 - 12)
+
+    def test_rng(self):
+        """A run with its own generator ignores the global random state"""
+        from numpy.random import default_rng
+        cr = Creature(zeros(10), ones(10), 0.033)
+        runs = []
+        for global_seed in (1, 2):
+            random.seed(global_seed)
+            runs.append(eps_moea_optimize(cr, 20, 50, 200, tau1, 
+                r_[0.05, 0.05], batch_size=3, rng=default_rng(11)))
+        self.assert_same_run(*runs)
+
+    def test_breed_many(self):
+        """Bulk breeding keeps offspring in bounds and pairs in order"""
+        cr = Creature(zeros(10), ones(10), 0.5)
+        mamas = random.random_sample((50, 10))
+        papas = mamas.copy()
+        papas[::2] = random.random_sample((25, 10))
+        
+        offsprings = cr.breed_many(mamas, papas)
+        self.assertEqual(offsprings.shape, (100, 10))
+        self.assertTrue((offsprings >= 0).all() and (offsprings <= 1).all())
+        
+        # Identical parents are not recombined, so without mutation their
+        # offspring are copies:
+        cr = Creature(zeros(10), ones(10), 0.)
+        offsprings = cr.breed_many(mamas, papas)
+        testing.assert_array_equal(offsprings[2::4], mamas[1::2])
+        testing.assert_array_equal(offsprings[3::4], mamas[1::2])
+
+        # Offspring are distributed as breed()'s. Two-sample Kolmogorov-
+        # Smirnov statistic per gene, for the same pair bred many times:
+        random.seed(2)
+        cr = Creature(zeros(10), ones(10), 0.1)
+        mama, papa = random.random_sample(10), random.random_sample(10)
+        single = vstack([cr.breed(mama, papa) for pair in range(4000)])
+        many = cr.breed_many(N.tile(mama, (4000, 1)), N.tile(papa, (4000, 1)))
+        for gene in range(10):
+            points = hstack((single[:,gene], many[:,gene]))
+            cdfs = [N.searchsorted(N.sort(sample[:,gene]), points, 'right') \
+                / float(len(sample)) for sample in (single, many)]
+            self.assertTrue(abs(cdfs[0] - cdfs[1]).max() < 0.04)
+
+    def test_resume(self):
+        """A run resumed from a checkpoint ends as if never interrupted"""
+        import tempfile, shutil
+        from .checkpoint import Checkpointer
+        cr = Creature(zeros(10), ones(10), 0.033)
+        path = tempfile.mkdtemp()
+        try:
+            random.seed(7)
+            full = eps_moea_optimize(cr, 20, 500, 300, tau1, r_[0.05, 0.05],
+                batch_size=3, checkpoint=Checkpointer(path, every_gens=50))
+            
+            # The last save was 45 iterations before the end:
+            resumed = eps_moea_optimize(cr, 20, 500, 300, tau1, r_[0.05, 0.05],
+                batch_size=3, resume_from=path)
+        finally:
+            shutil.rmtree(path)
+        
+        self.assert_same_run(full, resumed)
+
+    def test_checkpoint_sync(self):
+        """A checkpoint copy is synced to disk before the pointer names it"""
+        import os, tempfile, shutil
+        from . import checkpoint
+        synced = [] # inodes, in order.
+        pointed = [] # number of syncs when the pointer was replaced.
+        real_fsync, real_replace = os.fsync, checkpoint._replace
+        def fsync(fd):
+            synced.append(os.fstat(fd).st_ino)
+            real_fsync(fd)
+        def replace(src, dst):
+            if os.path.basename(dst) == 'current':
+                pointed.append(len(synced))
+            real_replace(src, dst)
+
+        path = tempfile.mkdtemp()
+        os.fsync, checkpoint._replace = fsync, replace
+        try:
+            population = random.random_sample((20, 10))
+            changed = zeros(20, dtype=bool)
+            checkpoint.Checkpointer(path).save(population, population[:,:2],
+                changed, gens_left=10)
+
+            before, after = synced[:pointed[0]], synced[pointed[0]:]
+            for name in ('population.1.npy', 'fitness.1.npy', 'state.1.npz',
+                os.curdir):
+                self.assertTrue(
+                    os.stat(os.path.join(path, name)).st_ino in before)
+            self.assertTrue(os.stat(path).st_ino in after)
+        finally:
+            os.fsync, checkpoint._replace = real_fsync, real_replace
+            shutil.rmtree(path)
+
+    def test_cache(self):
+        """Cached evaluations change nothing but the objectives calls"""
+        from .cache import EvaluationCache
+        cr = Creature(zeros(10), ones(10), 0.033)
+        cache = EvaluationCache(100)
+        calls = []
+        def counting_tau1(contenders):
+            calls.append(len(contenders))
+            return tau1(contenders)
+        
+        random.seed(7)
+        plain = eps_moea_optimize(cr, 20, 500, 300, tau1, r_[0.05, 0.05])
+        random.seed(7)
+        cached = eps_moea_optimize(cr, 20, 500, 300, counting_tau1, 
+            r_[0.05, 0.05], cache=cache)
+        
+        self.assert_same_run(plain, cached)
+        self.assertTrue(cache.hits > 0)
+        self.assertEqual(sum(calls), cache.misses)
+        self.assertEqual(cache.hits + cache.misses, 20 + 2*300)
+        self.assertEqual(len(cache), 100)
+
+    def test_stats(self):
+        """Run statistics account for every iteration and offspring"""
+        from .stats import RunStats
+        cr = Creature(zeros(10), ones(10), 0.033)
+        records = []
+        stats = RunStats(sink=records.append)
+        eps_moea_optimize(cr, 20, 500, 300, tau1, r_[0.05, 0.05], batch_size=4,
+            stats=stats)
+        
+        self.assertEqual(records[-1]['iteration'], 300)
+        self.assertEqual(len(records), 1 + 300 // 4)
+        self.assertEqual(stats.offsprings, 600)
+        self.assertEqual(stats.evaluations, 620)
+        self.assertEqual(stats.calls['archive_accept'], 601)
+        self.assertEqual(sum(rec['archive_accepts'] for rec in records), 
+            stats.archive_accepts)
+
+    def test_islands(self):
+        """Island runs are reproducible and merge into an epsilon-archive"""
+        from .islands import island_optimize
+        cr = Creature(zeros(10), ones(10), 0.033)
+        grid = r_[0.05, 0.05]
+        runs = [island_optimize(cr, 20, 500, 300, tau1, grid, num_islands=3,
+            migration_gens=50, num_migrants=4, seed=5) for run in range(2)]
+        
+        testing.assert_array_equal(runs[0].genes, runs[1].genes)
+        testing.assert_array_equal(runs[0].fitness, runs[1].fitness)
+        fitness = runs[0].fitness
+        self.assertTrue(pareto_front(fitness).all())
+        boxes = set(tuple(box) for box in grid_boxes(fitness, grid))
+        self.assertEqual(len(boxes), len(fitness))
+        
+        # A generator given as rng seeds the islands instead of seed:
+        from numpy.random import default_rng
+        runs = [island_optimize(cr, 20, 500, 300, tau1, grid, num_islands=2,
+            migration_gens=50, num_migrants=4, rng=default_rng(3)) \
+            for run in range(2)]
+        testing.assert_array_equal(runs[0].genes, runs[1].genes)
+        
+        # So does a RandomStream over that generator:
+        from .streams import RandomStream
+        run = island_optimize(cr, 20, 500, 300, tau1, grid, num_islands=2,
+            migration_gens=50, num_migrants=4, 
+            rng=RandomStream(default_rng(3)))
+        testing.assert_array_equal(run.genes, runs[0].genes)
+        
+        # An island whose process dies is reported, not waited for:
+        self.assertRaises(RuntimeError, island_optimize, cr, 20, 500, 300, 
+            die, grid, num_islands=2)
+
+    def test_dominance_index(self):
+        """DominanceIndex accepts like pop_accept, across replacements"""
+        from .dominance import DominanceIndex
+        random.seed(3)
+        fitness = random.randint(0, 10, size=(200, 3)).astype(float)
+        index = DominanceIndex(fitness.copy())
+        for contender in range(500):
+            contend_fit = random.randint(0, 10, size=3).astype(float)
+            rng_state = random.get_state()
+            repl = pop_accept(fitness, contend_fit)
+            random.set_state(rng_state)
+            self.assertEqual(index.accept(contend_fit), repl)
+            if repl is not None:
+                fitness[repl] = contend_fit
+                index.replace(repl, contend_fit)
+        testing.assert_array_equal(index.fitness, fitness)
+
+    def test_eps_archive(self):
+        """The archive grows past its capacity and keeps its members' genes"""
+        from .archive import EpsArchive
+        grid = r_[0.01, 0.01]
+        archive = EpsArchive(empty((0, 1)), empty((0, 2)), 
+            empty((0, 2), dtype=int), capacity=1, grid=grid)
+        for x in r_[1:11]:
+            fit = r_[x, 1./x]
+            self.assertTrue(archive.accept(r_[x], fit, grid_boxes(fit, grid)))
+        testing.assert_array_equal(archive.genes[:,0], r_[1:11])
+        
+        # (2.5, 0.25) dominates the members from x=3 and x=4, the last members
+        # are moved to their places:
+        fit = r_[2.5, 0.25]
+        self.assertTrue(archive.accept(r_[0], fit, grid_boxes(fit, grid)))
+        testing.assert_array_equal(archive.genes[:,0], 
+            r_[1, 2, 9, 10, 5, 6, 7, 8, 0])
+    
+    def test_negative_boxes(self):
+        """Fitness below zero is boxed by rounding down"""
+        from .archive import EpsArchive
+        grid = r_[0.1, 0.1]
+        fitness = array([[-0.05, 0.55], [0.05, 0.52]])
+        testing.assert_array_equal(grid_boxes(fitness, grid), [[-1, 5], [0, 5]])
+        
+        # The first box dominates the second, though the members don't:
+        archive = EpsArchive(empty((0, 1)), empty((0, 2)), 
+            empty((0, 2), dtype=int), grid=grid)
+        self.assertTrue(archive.accept(r_[0], fitness[0], 
+            grid_boxes(fitness[0], grid)))
+        self.assertFalse(archive.accept(r_[1], fitness[1], 
+            grid_boxes(fitness[1], grid)))
+
+    def test_iter_eps_moea(self):
+        """Archive events replay into the final archive, and stop the run"""
+        cr = Creature(zeros(10), ones(10), 0.033)
+        random.seed(7)
+        population, fitness, archive = eps_moea_optimize(cr, 20, 500, 300, 
+            tau1, r_[0.05, 0.05], batch_size=4)
+        
+        random.seed(7)
+        members = {}
+        summaries = []
+        for event in iter_eps_moea(cr, 20, 500, 300, tau1, r_[0.05, 0.05], 
+            batch_size=4):
+            if isinstance(event, GenerationSummary):
+                summaries.append(event)
+                self.assertEqual(event.archive_size, len(members))
+            elif event.inserted:
+                members[event.genes.tobytes()] = event.fitness
+            else:
+                del members[event.genes.tobytes()]
+        
+        self.assertEqual(summaries[-1].iteration, 300)
+        self.assertEqual(sorted(members), 
+            sorted(genes.tobytes() for genes in archive.genes))
+        
+        # Stop early:
+        for event in iter_eps_moea(cr, 20, 500, 300, tau1, r_[0.05, 0.05]):
+            if isinstance(event, GenerationSummary) and event.iteration == 10:
+                break
+        self.assertEqual(event.iteration, 10)
+
+    def test_convergence_monitor(self):
+        """Hypervolume is exact for few objectives, and stops a stalled run"""
+        import tempfile, shutil
+        from .indicators import hypervolume, ConvergenceMonitor
+        from .checkpoint import Checkpointer
+        self.assertEqual(hypervolume(array([[1., 2.], [2., 1.]]), r_[3, 3]), 3.)
+        self.assertEqual(hypervolume(array([[1., 2., 2.], [2., 1., 2.], 
+            [2., 2., 1.]]), r_[3, 3, 3]), 4.)
+        
+        cr = Creature(zeros(10), ones(10), 0.1)
+        monitor = ConvergenceMonitor(r_[1.1, 11], min_gain=0.01, window=1000)
+        random.seed(7)
+        eps_moea_optimize(cr, 20, 10**6, 10**6, tau1, r_[0.001, 0.001],
+            batch_size=10, monitor=monitor)
+        
+        (first_evals, first_vol), (last_evals, last_vol) = \
+            monitor.history[0], monitor.history[-1]
+        self.assertTrue(1000 <= last_evals - first_evals < 1100)
+        self.assertTrue(last_evals < 10**5)
+        self.assertTrue(0 < last_vol - first_vol < 0.01)
+        
+        # The monitor's history and samples go into checkpoints, so a 
+        # resumed run stops where the uninterrupted one did:
+        path = tempfile.mkdtemp()
+        try:
+            for reference in (r_[1.1, 11], r_[1.1, 11, 1, 1]):
+                objectives = lambda genes: N.hstack((tau1(genes), 
+                    zeros((len(genes), len(reference) - 2))))
+                monitor = ConvergenceMonitor(reference, min_gain=0.01, 
+                    window=1000, samples=2000)
+                random.seed(7)
+                full = eps_moea_optimize(cr, 20, 10**6, 10**6, objectives, 
+                    r_[0.001, 0.001, 1, 1][:len(reference)], batch_size=10, 
+                    monitor=monitor, 
+                    checkpoint=Checkpointer(path, every_gens=300))
+                
+                resumed_monitor = ConvergenceMonitor(reference, 
+                    min_gain=0.01, window=1000, samples=2000)
+                resumed = eps_moea_optimize(cr, 20, 10**6, 10**6, objectives,
+                    r_[0.001, 0.001, 1, 1][:len(reference)], batch_size=10, 
+                    monitor=resumed_monitor, resume_from=path)
+                
+                self.assert_same_run(full, resumed)
+                self.assertEqual(resumed_monitor.history, monitor.history)
+        finally:
+            shutil.rmtree(path)
+
+        # Monte Carlo estimates count progress below the first sampled box,
+        # and monitors don't share samples:
+        from collections import namedtuple
+        Archive = namedtuple('Archive', 'fitness')
+        monitors = [ConvergenceMonitor(ones(4), 1., 10, check_every=1,
+            samples=20000) for run in range(2)]
+        for evaluations, point in ((1, 0.5), (2, 0.5), (3, 0.1)):
+            for monitor in monitors:
+                monitor.update(evaluations, Archive(ones((1, 4))*point))
+
+        self.assertEqual(monitors[0].history, monitors[1].history)
+        volumes = r_[[volume for evals, volume in monitors[0].history]]
+        testing.assert_allclose(volumes, r_[0.5, 0.5, 0.9]**4, rtol=0.05)
+
+    def test_surrogate(self):
+        """Offspring screened out by the surrogate are not evaluated"""
+        import tempfile, shutil
+        from .surrogate import KNNSurrogate
+        from .stats import RunStats
+        from .checkpoint import Checkpointer
+        cr = Creature(zeros(10), ones(10), 0.1)
+        surrogate = KNNSurrogate(margin=0.)
+        stats = RunStats()
+        random.seed(7)
+        eps_moea_optimize(cr, 20, 10**6, 500, tau1, r_[0.01, 0.01], 
+            batch_size=5, stats=stats, surrogate=surrogate)
+        
+        self.assertTrue(surrogate.saved > 0)
+        self.assertEqual(surrogate.screened, 1000)
+        self.assertEqual(stats.evaluations + surrogate.saved, 20 + 1000)
+        self.assertEqual(stats.offsprings, 1000 - surrogate.saved)
+        self.assertEqual(len(surrogate.error()), 2)
+        
+        # The model's samples and error go into checkpoints, so a resumed
+        # run screens as the uninterrupted one did:
+        path = tempfile.mkdtemp()
+        try:
+            surrogate = KNNSurrogate()
+            random.seed(7)
+            full = eps_moea_optimize(cr, 20, 10**6, 500, tau1, 
+                r_[0.01, 0.01], batch_size=5, surrogate=surrogate, 
+                checkpoint=Checkpointer(path, every_gens=100))
+            
+            resumed_model = KNNSurrogate()
+            resumed = eps_moea_optimize(cr, 20, 10**6, 500, tau1, 
+                r_[0.01, 0.01], batch_size=5, surrogate=resumed_model, 
+                resume_from=path)
+        finally:
+            shutil.rmtree(path)
+        
+        self.assert_same_run(full, resumed)
+        self.assertEqual(resumed_model.saved, surrogate.saved)
+        self.assertEqual(resumed_model.screened, surrogate.screened)
+        testing.assert_array_equal(resumed_model.error(), surrogate.error())
+
+    def test_history(self):
+        """Every offspring is recorded with its acceptance outcome"""
+        import os, tempfile, shutil
+        from .history import HistoryRecorder, read_history, ARCHIVED, REPLACED
+        from .stats import RunStats
+        path = tempfile.mkdtemp()
+        try:
+            recorder = HistoryRecorder(path, chunk=64)
+            stats = RunStats()
+            random.seed(7)
+            population, fitness, archive = eps_moea_optimize(
+                Creature(zeros(10), ones(10), 0.1), 20, 10**6, 300, tau1, 
+                r_[0.01, 0.01], batch_size=4, stats=stats, history=recorder)
+            recorder.close()
+            
+            history = read_history(path)
+            self.assertEqual(len(history.genes), 20 + 600)
+            testing.assert_array_equal(history.fitness, tau1(history.genes))
+            testing.assert_array_equal(history.iteration[20:], 
+                r_[1:301].repeat(2))
+            
+            offspring = history.outcome[20:]
+            self.assertEqual(((offspring & REPLACED) != 0).sum(), 
+                stats.pop_accepts)
+            self.assertEqual(((offspring & ARCHIVED) != 0).sum(), 
+                stats.archive_accepts)
+            
+            # Closing iter_eps_moea() early flushes the history:
+            cr = Creature(zeros(10), ones(10), 0.1)
+            grid = r_[0.01, 0.01]
+            early = os.path.join(path, 'early')
+            events = iter_eps_moea(cr, 20, 10**6, 300, tau1, grid, 
+                history=HistoryRecorder(early))
+            for event in events:
+                if isinstance(event, GenerationSummary) and \
+                    event.iteration == 10:
+                    break
+            events.close()
+            self.assertEqual(len(read_history(early).genes), 20 + 20)
+            
+            # Offspring bred before a checkpoint and accepted after resuming
+            # keep the iteration that bred them:
+            from .checkpoint import Checkpointer
+            from .eps_moea import _save_checkpoint
+            saved = os.path.join(path, 'checkpoint')
+            run = EpsMOEA(cr, 20, 10**6, 300, tau1, grid, batch_size=4)
+            run.run(100)
+            _save_checkpoint(Checkpointer(saved), run.population, 
+                run.fitness, ones(20, dtype=bool), run.archive, 
+                run.archive_stagnation, run.gens_left, run.evaluations, 
+                [(97, cr.gen_population(8))], run.rng)
+            
+            resumed = os.path.join(path, 'resumed')
+            recorder = HistoryRecorder(resumed)
+            EpsMOEA(cr, 20, 10**6, 300, tau1, grid, batch_size=4, 
+                resume_from=saved, history=recorder).run(0)
+            recorder.close()
+            testing.assert_array_equal(read_history(resumed).iteration, 
+                r_[97:101].repeat(2))
+        finally:
+            shutil.rmtree(path)
+
+    def test_constraints(self):
+        """Infeasible individuals are not evaluated and lose to feasible ones"""
+        evaluated = []
+        def objectives(genes):
+            self.assertTrue((genes[:,0] >= 0.5).all())
+            evaluated.append(len(genes))
+            return tau1(genes)
+        def constraints(genes):
+            return 0.5 - genes[:,:1]
+        
+        # A feasible contender replaces an infeasible underdog:
+        fitness = array([[0., 0.], [inf, inf]])
+        self.assertEqual(pop_accept(fitness, r_[1., 1.], 
+            violation=r_[0., 0.3]), 1)
+        
+        cr = Creature(zeros(10), ones(10), 0.1)
+        random.seed(7)
+        population, fitness, archive = eps_moea_optimize(cr, 20, 10**6, 300,
+            objectives, r_[0.01, 0.01], batch_size=4, constraints=constraints)
+        
+        self.assertTrue(sum(evaluated) < 20 + 600)
+        self.assertTrue((archive.genes[:,0] >= 0.5).all())
+        self.assertEqual(archive.violation, 0)
+        feasible = population[:,0] >= 0.5
+        testing.assert_array_equal(fitness[feasible], tau1(population[feasible]))
+
+        # Evaluations that give infinite objectives still count:
+        def objectives(genes):
+            evaluated.append(len(genes))
+            return N.where(genes[:,1:2] > 0.5, inf, tau1(genes))
+        evaluated = []
+        run = EpsMOEA(cr, 20, 10**6, 0, objectives, r_[0.01, 0.01],
+            constraints=constraints)
+        self.assertEqual(run.evaluations, sum(evaluated))
+
+    def test_lazy_import(self):
+        """Importing the package loads none of its modules, nor numpy"""
+        import os, sys, subprocess
+        package = __name__.rpartition('.')[0]
+        path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        loaded = subprocess.check_output([sys.executable, '-c', 
+            "import sys; sys.path.insert(0, %r); import %s; "
+            "print(' '.join(sorted(sys.modules)))" % (path, package)])
+        loaded = loaded.decode().split()
+        self.assertFalse('numpy' in loaded)
+        self.assertEqual([name for name in loaded if name.startswith(package)],
+            [package])
+        
+        loaded = subprocess.check_output([sys.executable, '-c', 
+            "import sys; sys.path.insert(0, %r); "
+            "from %s import eps_moea_optimize; "
+            "print(' '.join(sorted(sys.modules)))" % (path, package)])
+        loaded = loaded.decode().split()
+        for module in ('aio', 'islands', 'test_functions', 'benchmark'):
+            self.assertFalse(package + '.' + module in loaded)
+        self.assertFalse('matplotlib' in loaded)
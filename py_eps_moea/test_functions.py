@@ -2,30 +2,46 @@
 # Evolutionary Algorithms: Empirical Results, Evolutionary computation, 2000,
 # vol 8(2), pp. 173-195.
 #
+# The scalable DTLZ2 problem is from Deb K. et al, Scalable Test Problems for
+# Evolutionary Multiobjective Optimization, in Evolutionary Multiobjective 
+# Optimization, Springer, 2005, pp. 105-145. Its number of objectives is an
+# argument; use e.g. functools.partial(dtlz2, num_targets=5) as objectives.
+#
 # Arguments: 
 # contenders - those whose fitness is to be evaluated
 
-from numpy import array, sqrt, hstack, atleast_2d, sin, pi
+from numpy import sqrt, hstack, atleast_2d, sin, cos, pi, ones, cumprod
 
 def tau1(contenders):
-    contenders = array(contenders, copy=False, ndmin=2)
+    contenders = atleast_2d(contenders)
     fit1 = contenders[:,0]
     g = 1 + 9./(contenders.shape[1] - 1) * contenders[:,1:].sum(axis=1)
     h = 1 - sqrt(fit1 / g)
     return hstack((fit1[:,None], (g*h)[:,None]))
 
 def tau2(contenders):
-    contenders = array(contenders, copy=False, ndmin=2)
+    contenders = atleast_2d(contenders)
     fit1 = contenders[:,0]
     g = 1 + 9./(contenders.shape[1] - 1) * contenders[:,1:].sum(axis=1)
     h = 1 - (fit1 / g)**2
     return hstack((fit1[:,None], (g*h)[:,None]))
 
 def tau3(contenders):
-    contenders = array(contenders, copy=False, ndmin=2)
+    contenders = atleast_2d(contenders)
     fit1 = contenders[:,0]
     g = 1 + 9./(contenders.shape[1] - 1) * contenders[:,1:].sum(axis=1)
     h = 1 - sqrt(fit1 / g) - (fit1 / g)*sin(pi*10*fit1)
     return hstack((fit1[:,None], (g*h)[:,None]))
 
 tzd = [tau1, tau2, tau3]
+
+def dtlz2(contenders, num_targets=3):
+    contenders = atleast_2d(contenders)
+    angles = contenders[:,:num_targets - 1]*pi/2
+    g = ((contenders[:,num_targets - 1:] - 0.5)**2).sum(axis=1)
+    
+    # Objective i is the product of the first M-i cosines and one sine:
+    unit = ones((contenders.shape[0], 1))
+    cos_prods = cumprod(hstack((unit, cos(angles))), axis=1)
+    sines = hstack((unit, sin(angles[:,::-1])))
+    return (1 + g)[:,None] * cos_prods[:,::-1] * sines